@@ -1,2 +1,3 @@
-from .instrument_components import instrument_components
+from .instrument_components import (instrument_components,
+                                    instrument_components_registry)
 from .instrument_component import instrument_component
@@ -11,6 +11,7 @@ nomenclature:
 I need to modify the code so that it treats a $ref as a placeholder for the associated object
 """
 # Standard library modules
+import copy
 import math as m
 import os.path
 import sys
@@ -42,6 +43,7 @@ class instrument_component:
         component_type=None,
         reference_code=None,
         sample_rate = None,
+        response_cache=None,
         debug=False,
     ):
         """ Inputs:
@@ -50,6 +52,8 @@ class instrument_component:
                 basepath: full path of directory containing Instrument_Components file
                 component_type = component type ('datalogger','preamplifier' or 'sensor')
                 reference_code = component reference code
+                response_cache = dict in which to share filled responses
+                                 (read-only) between components
             
         """
         if debug:
@@ -63,16 +67,63 @@ class instrument_component:
         self.reference_code = reference_code
         self.sample_rate = sample_rate 
         self.response = None
+        self.response_cache = response_cache
 
     def __repr__(self):
         return "<OBS_Instrument_Component: {}>".format(self.reference_code)
 
+    def overlay(self, serial_number=None, equipment=None, response_stages=None):
+        """ Returns a channel's copy of this (template) component
+
+            The copy shares the template's data (response stages, seed
+            codes...), which must not be modified.  Its equipment is copied
+            only if serial_number or equipment change it.
+            Inputs:
+                serial_number: component serial number
+                equipment: FDSN equipment_type to merge into the equipment
+                response_stages: specific response stages list, replacing
+                                 the template's
+        """
+        component = copy.copy(self)
+        if serial_number or equipment:
+            component.equipment = copy.copy(self.equipment)
+            if serial_number:
+                component.equipment.serial_number = serial_number
+            if equipment:
+                component.equipment.merge(equipment)
+        if response_stages:
+            component.response_superstages = response_stages
+            component.response = None
+        return component
+
+    def response_key(self):
+        """ Returns a key identifying the component's response: directory,
+            type, reference code (including configuration) and response files
+        """
+        return (
+            self.basepath,
+            self.type,
+            self.reference_code,
+            tuple(superstage["$ref"] for superstage in self.response_superstages),
+        )
+
     def fill_responses(self, debug=False):
-        """ Fill in instrument responses from references"""
+        """ Fill in instrument responses from references
+
+            If the component has a response_cache, the response is read only
+            once per response_key() and shared: it must not be modified
+        """
         if debug:
             print("self.response_superstages=", end="")
             print(yaml.dump(self.response_superstages))
-        self.__read_response_yamls()
+        if self.response_cache is None:
+            self.__read_response_yamls()
+        else:
+            key = self.response_key()
+            if key not in self.response_cache:
+                self.__read_response_yamls()
+                self.response_cache[key] = self.response
+            self.response = self.response_cache[key]
         if debug:
             print("self.response=", end="")
             print(yaml.dump(self.response))
@@ -17,7 +17,8 @@ import obspy.core.inventory.util as obspy_util
 from obspy.core.utcdatetime import UTCDateTime
 
 # obsinfo modules
-from ..misc.info_files import load_information_file
+from ..misc.info_files import load_information_file, resolve_path
+from ..misc.disk_cache import file_hash
 from ..misc.FDSN import equipment_type as FDSN_equipment_type
 from .instrument_component import instrument_component as oi_instrument_component
 
@@ -37,25 +38,107 @@ class instrument_components:
         self.format_version = temp["format_version"]
         # self.facility_reference_name=temp['facility_reference_name']
         self.instrument_blocks = temp["instrument_components"]["instrument_blocks"]
+        self.__build_indexes()
+        self._templates = dict()
+        self.responses = dict()
 
     def __repr__(self):
         return "<instrument_components: {}>".format(self.filename)
 
-    def __load_specific_component(self, component, serial_number, debug=False):
-        if not "specific" in self.instrument_blocks[component.type]:
-            return component
-        elif not serial_number in self.instrument_blocks[component.type]["specific"]:
-            return component
-        specific = self.instrument_blocks[component.type]["specific"][serial_number]
+    def __build_indexes(self):
+        """ Index the components once, for constant-time lookups
+
+            generic_index[block_type][(base_code, config)] = reference_code
+                (config is None for the full reference code)
+            config_index[block_type][base_code] = list of the reference codes
+                "{base_code}_{config}"
+            specific_index[block_type][(reference_code, serial_number)] =
+                specific component dictionary ("specific" is keyed by
+                reference code, then serial number)
+        """
+        self.generic_index = dict()
+        self.config_index = dict()
+        self.specific_index = dict()
+        for block_type, block in self.instrument_blocks.items():
+            generic_index = dict()
+            config_index = dict()
+            for code in block.get("generic", {}):
+                generic_index[(code, None)] = code
+                parts = code.split("_")
+                for i in range(1, len(parts)):
+                    base = "_".join(parts[:i])
+                    generic_index[(base, "_".join(parts[i:]))] = code
+                    config_index.setdefault(base, []).append(code)
+            specific_index = dict()
+            for code, serial_numbers in (block.get("specific", None) or {}).items():
+                for serial_number, specific in (serial_numbers or {}).items():
+                    specific_index[(code, serial_number)] = specific
+            self.generic_index[block_type] = generic_index
+            self.config_index[block_type] = config_index
+            self.specific_index[block_type] = specific_index
+
+    def get_generic(self, block_type, reference_code, config=None):
+        """ Returns the generic component dictionary for reference_code (and
+            configuration, if given), or None if there is none """
+        code = self.generic_index[block_type].get((reference_code, config), None)
+        if code is None:
+            return None
+        return self.instrument_blocks[block_type]["generic"][code]
+
+    def get_config_variants(self, block_type, reference_code):
+        """ Returns the reference codes of all the configurations of
+            reference_code ("{reference_code}_{config}"), or None if none """
+        return list(self.config_index[block_type].get(reference_code, [])) or None
+
+    def get_template(self, block_type, reference_code):
+        """ Returns the shared (read-only) generic component for
+            reference_code, or None if there is none """
+        key = (block_type, reference_code)
+        if key not in self._templates:
+            generic = self.get_generic(block_type, reference_code)
+            if generic is None:
+                return None
+            self._templates[key] = oi_instrument_component(
+                generic,
+                self.basepath,
+                component_type=block_type,
+                reference_code=reference_code,
+                sample_rate=generic.get("sample_rate", None),
+                response_cache=self.responses,
+            )
+        return self._templates[key]
+
+    def get_specific(self, block_type, reference_code, serial_number):
+        """ Returns the specific component dictionary for serial_number of
+            reference_code, or None if there is none
+
+            A configured reference code ("{base_code}_{config}") also matches
+            the specific components of its base code
+        """
+        index = self.specific_index[block_type]
+        parts = reference_code.split("_")
+        for i in range(len(parts), 0, -1):
+            specific = index.get(("_".join(parts[:i]), serial_number), None)
+            if specific is not None:
+                return specific
+        return None
+
+    def __load_specific_component(self, template, serial_number, debug=False):
+        specific = self.get_specific(
+            template.type, template.reference_code, serial_number
+        )
+        if specific is None:
+            return template.overlay(serial_number)
         if debug:
-            print("[{}][{}]=".format(component.type, serial_number))
+            print("[{}][{}][{}]=".format(
+                template.type, template.reference_code, serial_number))
             print("specific=", specific)
-        if "response" in specific:
-            for key in specific["response"]:
-                component["response"][key] = specific["response"][key]
+        equipment = None
         if "equipment" in specific:
-            component.equipment.merge(FDSN_equipment_type(specific["equipment"]))
-        return component
+            equipment = FDSN_equipment_type(specific["equipment"])
+        return template.overlay(
+            serial_number, equipment, specific.get("response_stages", None)
+        )
 
     def __check_response_files(
         self, files_dict, component_dict, resp_dir, print_names, debug=False
@@ -116,27 +199,13 @@ class instrument_components:
                                             OR 
                                       list of possible component names
         """
-        if reference_code not in self.instrument_blocks[block_type]["generic"]:
-            code_list = []
-            for generic_code in self.instrument_blocks[block_type]["generic"]:
-                if (reference_code + "_") in generic_code:
-                    code_list.append(generic_code)
-            if not code_list:
-                code_list = None
-            return code_list
-        # LOAD GENERIC COMPONENT
-        sample_rate = self.instrument_blocks[block_type]["generic"][reference_code]["sample_rate"] if "sample_rate" in self.instrument_blocks[block_type]["generic"][reference_code] else None
-        component = oi_instrument_component(
-            self.instrument_blocks[block_type]["generic"][reference_code], self.basepath, sample_rate=sample_rate
-        )
-
-        component.reference_code = reference_code
-        component.type = block_type
-        if serial_number:
-            component.equipment.serial_number = serial_number
-            # LOAD SPECIFIC COMPONENT, IF IT EXISTS
-            component = self.__load_specific_component(component, serial_number)
-        return component
+        template = self.get_template(block_type, reference_code)
+        if template is None:
+            return self.get_config_variants(block_type, reference_code)
+        if not serial_number:
+            return template.overlay()
+        # LOAD SPECIFIC COMPONENT, IF IT EXISTS
+        return self.__load_specific_component(template, serial_number)
 
     def print_elements(self, elem_type):
         """ prints one type of InstrumentComponent (descriptions and  serial numbers)
@@ -228,3 +297,30 @@ class instrument_components:
                 else:
                     print("    NOT FOUND ({:2d} cites): {}".format(n_cites, filename))
         return total_files, total_found, total_cites
+
+
+################################################################################
+class instrument_components_registry:
+    """ instrument_components objects shared within a network build
+
+    Keyed by resolved path and file contents (so a new revision of a file gives
+    a new object): every instrument citing the same components file gets the
+    same object, and its instrument_blocks exist only once in memory.
+    The shared objects must not be modified.
+    """
+
+    def __init__(self):
+        self.components = dict()
+
+    def __repr__(self):
+        return "<instrument_components_registry: {:d} files>".format(
+            len(self.components)
+        )
+
+    def get(self, filename, referring_file=None):
+        """ Returns the instrument_components object for filename, loading it if needed """
+        path = os.path.abspath(resolve_path(filename, referring_file))
+        key = (path, file_hash(path))
+        if key not in self.components:
+            self.components[key] = instrument_components(path)
+        return self.components[key]
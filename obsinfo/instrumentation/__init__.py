@@ -1,2 +1,2 @@
-from .instrumentation import instrumentation
+from .instrumentation import instrumentation, instrumentation_registry
 from .instrument import instrument
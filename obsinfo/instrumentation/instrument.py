@@ -10,6 +10,7 @@ Should modify the code to treat $ref as a placeholder for the associated object
 """
 # Standard library modules
 import math as m
+import copy
 import json
 import pprint
 import os.path
@@ -30,16 +31,20 @@ from ..misc import FDSN
 class instrument:
     """ One instrument from instrumentation.yaml file"""
 
-    def __init__(self, filename, station_instrument, referring_file=None, debug=False):
+    def __init__(self, filename, station_instrument, referring_file=None, debug=False,
+                 instrumentation=None):
         """ Load an instrument 
     
         Inputs:
             station_instrument: is an OBS_Station.instrument dictionary
                     station_instrument['reference_code'] must correspond to
                         a key in instrumentation['instruments'])        
+            instrumentation: already loaded instrumentation object for
+                    filename (shared between instruments, not modified)
         """
 
-        instrumentation = oi_instrumentation(filename, referring_file)
+        if instrumentation is None:
+            instrumentation = oi_instrumentation(filename, referring_file)
         if debug:
             print(60 * "=")
             print(type(station_instrument))
@@ -63,7 +68,7 @@ class instrument:
             else None
         )
         self.equipment = FDSN.equipment_type(generic["equipment"])
-        self.das_components = generic["das_components"]
+        self.das_components = copy.deepcopy(generic["das_components"])
 
         # SET SPECIFIC ATTRIBUTES (IF ANY)
         specific = self.__get_specific_instrument(instrumentation)
@@ -223,15 +228,21 @@ class instrument:
                 print(chan_loc_code, component)
                 pprint.pprint(self.channels[chan_loc_code])
 
-    def load_components(self, components_file, referring_file=None):
+    def load_components(self, components_file, referring_file=None,
+                        registry=None):
         """
         Load components into instrument
         
         components_file = name of components file
         referring_file = file that referred to the components file
                          (for resolving paths)
+        registry = instrument_components_registry to get the (shared)
+                   components object from
         """
-        components = oi_instrument_components(components_file, referring_file)
+        if registry is not None:
+            components = registry.get(components_file, referring_file)
+        else:
+            components = oi_instrument_components(components_file, referring_file)
 
         for key in self.das_components:
             self.fill_channel(key, components)
@@ -23,7 +23,7 @@ import obspy.core.inventory.util as obspy_util
 from obspy.core.utcdatetime import UTCDateTime
 
 # obsinfo modules
-from ..misc.info_files import load_information_file, root_symbol
+from ..misc.info_files import load_information_file, resolve_path, root_symbol
 from ..misc import FDSN
 from ..instrument_components import instrument_components as oi_instrument_components
 
@@ -198,3 +198,27 @@ class instrumentation:
                     )
                 )
         return True, total_components, total_found, total_cites
+
+
+################################################################################
+class instrumentation_registry:
+    """ instrumentation objects shared by all the stations of a network
+
+    Keyed by resolved path, so that each instrumentation file is loaded only
+    once however many instruments refer to it
+    """
+
+    def __init__(self):
+        self.instrumentations = dict()
+
+    def __repr__(self):
+        return "<instrumentation_registry: {:d} instrumentations>".format(
+            len(self.instrumentations)
+        )
+
+    def get(self, filename, referring_file=None):
+        """ Returns the instrumentation object for filename, loading it if needed """
+        path = os.path.abspath(resolve_path(filename, referring_file))
+        if path not in self.instrumentations:
+            self.instrumentations[path] = instrumentation(path)
+        return self.instrumentations[path]
@@ -0,0 +1,320 @@
+"""
+On-disk caches shared between obsinfo runs
+
+The cache directory is $OBSINFO_CACHE_DIR if set, otherwise
+$XDG_CACHE_HOME/obsinfo (~/.cache/obsinfo by default)
+"""
+# Standard library modules
+import glob
+import hashlib
+import json
+import os
+import os.path
+import pickle
+import pkg_resources
+import shutil
+import tempfile
+import threading
+
+# obsinfo modules
+from ..version import __version__
+
+_schema_version = None
+_file_hashes = dict()
+
+
+def cache_directory():
+    """ Returns the obsinfo user cache directory (not necessarily existing) """
+    if os.environ.get("OBSINFO_CACHE_DIR"):
+        return os.environ["OBSINFO_CACHE_DIR"]
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(base, "obsinfo")
+
+
+def file_hash(filename):
+    """ Returns the SHA-256 hex digest of a file's contents
+
+    Digests are remembered for the process, as long as the file's
+    modification time and size do not change
+    """
+    path = os.path.abspath(filename)
+    stat = os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    entry = _file_hashes.get(path, None)
+    if entry is not None and entry[0] == signature:
+        return entry[1]
+    with open(path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    _file_hashes[path] = (signature, digest)
+    return digest
+
+
+def element_hash(element):
+    """ Returns the SHA-256 hex digest of an information file element (dict,
+    list or value), independent of the order of dict keys """
+    return hashlib.sha256(
+        json.dumps(element, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+def schema_version():
+    """
+    Returns a string identifying the installed schemas
+
+    Made from the obsinfo version and a hash of all schema files, so that
+    it changes whenever any schema (or a $ref'd definition) is modified
+    """
+    global _schema_version
+    if _schema_version is None:
+        schema_dir = pkg_resources.resource_filename("obsinfo", "data/schemas")
+        h = hashlib.sha256()
+        for fname in sorted(glob.glob(os.path.join(schema_dir, "*.json"))):
+            with open(fname, "rb") as f:
+                h.update(f.read())
+        _schema_version = f"{__version__}-{h.hexdigest()[:16]}"
+    return _schema_version
+
+
+def write_atomic(filename, data):
+    """ Writes data (str or bytes) to filename via a temporary file, so readers
+    never see a partial file.  Silently does nothing if the directory is not
+    writable """
+    try:
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=os.path.dirname(filename))
+        with os.fdopen(fd, "wb" if isinstance(data, bytes) else "w") as f:
+            f.write(data)
+        os.replace(tmp_name, filename)
+    except OSError:
+        pass
+
+
+################################################################################
+class validation_ledger:
+    """ Record of information files that have already passed validation
+
+    Entries are keyed by file content hash, information file type and schema
+    version, so a file is re-validated as soon as it or the schemas change.
+    Set revalidate=True to ignore the recorded entries (new passes are still
+    recorded).  New entries are kept in memory until save() writes them all
+    at once.
+    The default file is in the cache directory at the time of use, so it
+    follows changes of $OBSINFO_CACHE_DIR.
+    """
+
+    def __init__(self, filename=None, revalidate=False):
+        self._filename = filename
+        self.revalidate = revalidate
+        self._entries = None
+        self._entries_file = None
+        self._new_entries = set()
+        self._lock = threading.RLock()
+
+    @property
+    def filename(self):
+        if self._filename is not None:
+            return self._filename
+        return os.path.join(cache_directory(), "validated_files.json")
+
+    def __repr__(self):
+        return "<validation_ledger: {}>".format(self.filename)
+
+    def __len__(self):
+        return len(self._load())
+
+    @staticmethod
+    def _read(filename):
+        try:
+            with open(filename, "r") as f:
+                return set(json.load(f)["validated"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return set()
+
+    def _load(self):
+        with self._lock:
+            filename = self.filename
+            if self._entries_file != filename:
+                # The cache directory changed: save to the previous one first
+                self._save()
+                self._entries = self._read(filename)
+                self._entries_file = filename
+            return self._entries
+
+    @staticmethod
+    def _key(content_hash, type):
+        return f"{type}:{schema_version()}:{content_hash}"
+
+    def is_validated(self, content_hash, type):
+        """ True if a file with this content already passed validation """
+        if self.revalidate:
+            return False
+        return self._key(content_hash, type) in self._load()
+
+    def add(self, content_hash, type):
+        """ Records that a file with this content passed validation """
+        with self._lock:
+            key = self._key(content_hash, type)
+            if key not in self._load():
+                self._entries.add(key)
+                self._new_entries.add(key)
+
+    def save(self):
+        """ Writes the new entries, together with those other runs may have
+        written since the ledger was read """
+        with self._lock:
+            self._save()
+
+    def _save(self):
+        if not self._new_entries:
+            return
+        self._entries |= self._read(self._entries_file)
+        write_atomic(
+            self._entries_file,
+            json.dumps({"validated": sorted(self._entries)}, indent=0),
+        )
+        self._new_entries = set()
+
+    def clear(self):
+        """ Forgets all entries """
+        with self._lock:
+            self._entries = set()
+            self._entries_file = self.filename
+            self._new_entries = set()
+        if os.path.isfile(self.filename):
+            os.remove(self.filename)
+
+
+################################################################################
+class parsed_file_cache:
+    """ Pickled parse results of information files
+
+    Each parsed document is stored in its own file, named by the content hash
+    and format of the information file, in a subdirectory named after the
+    parser version.  Unchanged files can then be loaded without running the
+    YAML parser.  The default directory is in the cache directory at the time
+    of use, so it follows changes of $OBSINFO_CACHE_DIR.
+
+    At its first write in a process, the cache removes the subdirectories of
+    other parser versions, and its oldest files beyond max_size bytes.
+
+    Loading a pickle can run arbitrary code, so the cache trusts whoever can
+    write to its directory: it creates the directory readable by the user
+    only, and is not used if the directory belongs to someone else or is
+    writable by group or others.  Do not point $OBSINFO_CACHE_DIR to a shared
+    directory.
+    """
+
+    def __init__(self, parser_version, directory=None, enabled=True,
+                 max_size=256 * 1024 * 1024):
+        self.parser_version = parser_version
+        self._directory = directory
+        self.enabled = enabled
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._trusted = dict()
+        self._pruned = set()
+        self._lock = threading.Lock()
+
+    @property
+    def base_directory(self):
+        if self._directory is not None:
+            return self._directory
+        return os.path.join(cache_directory(), "parsed")
+
+    @property
+    def directory(self):
+        return os.path.join(self.base_directory, self.parser_version)
+
+    def __repr__(self):
+        return "<parsed_file_cache: {}, {:d} hits, {:d} misses>".format(
+            self.directory, self.hits, self.misses
+        )
+
+    def _path(self, content_hash, format):
+        return os.path.join(
+            self.directory, "{}.{}.pickle".format(content_hash, format.lower())
+        )
+
+    def is_trusted(self):
+        """ True if the cache directory belongs to the user and is not
+        writable by group or others (False if it does not exist) """
+        directory = self.directory
+        if directory not in self._trusted:
+            try:
+                stat = os.stat(directory)
+            except OSError:
+                return False
+            trusted = not stat.st_mode & 0o022
+            if hasattr(os, "getuid"):
+                trusted = trusted and stat.st_uid == os.getuid()
+            self._trusted[directory] = trusted
+        return self._trusted[directory]
+
+    def get(self, content_hash, format="YAML"):
+        """ Returns the stored document, or None if there is none """
+        element = None
+        if self.is_trusted():
+            try:
+                with open(self._path(content_hash, format), "rb") as f:
+                    element = pickle.load(f)
+            except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+                element = None
+        if element is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return element
+
+    def put(self, content_hash, element, format="YAML"):
+        """ Stores a parsed document """
+        try:
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        except OSError:
+            return
+        if not self.is_trusted():
+            return
+        self.prune(once=True)
+        write_atomic(
+            self._path(content_hash, format),
+            pickle.dumps(element, protocol=pickle.HIGHEST_PROTOCOL),
+        )
+
+    def prune(self, once=False):
+        """ Removes the subdirectories of other parser versions, and the
+        oldest stored documents beyond max_size bytes
+
+        once: do nothing if the directory was already pruned by this process
+        """
+        with self._lock:
+            directory = self.directory
+            if once and directory in self._pruned:
+                return
+            self._pruned.add(directory)
+        base = self.base_directory
+        try:
+            names = os.listdir(base)
+        except OSError:
+            return
+        for name in names:
+            path = os.path.join(base, name)
+            if name != self.parser_version and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+        files = []
+        for path in glob.glob(os.path.join(directory, "*.pickle")):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
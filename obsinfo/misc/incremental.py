@@ -0,0 +1,170 @@
+"""
+Incremental, dependency-aware validation of information files and
+StationXML builds
+
+Only files whose contents changed since the last run, and the files that
+refer to them (directly or through other files), are re-checked.  Only
+StationXML files whose inputs changed are rewritten.
+"""
+# Standard library modules
+import json
+import os.path
+
+# obsinfo modules
+from .info_files import read_json_yaml, validate_files
+from .disk_cache import cache_directory, file_hash, schema_version, write_atomic
+from ..version import __version__
+from .references import referenced_files
+
+
+################################################################################
+class incremental_validation:
+    """ Validation state of a set of information files, kept between runs
+
+    For each file, the state file records its content hash, whether it passed
+    validation and the files it references ("$ref").  The reverse of these
+    references tells which files must be re-checked when a file changes.
+    Files that failed are always re-checked.
+    """
+
+    def __init__(self, state_file=None):
+        if state_file is None:
+            state_file = os.path.join(cache_directory(), "incremental_validation.json")
+        self.state_file = state_file
+        self.files = dict()
+        try:
+            with open(self.state_file, "r") as f:
+                state = json.load(f)
+            if state["schema_version"] == schema_version():
+                self.files = state["files"]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    def __repr__(self):
+        return "<incremental_validation: {:d} files>".format(len(self.files))
+
+    def referrers(self):
+        """ Returns the reverse-dependency index {file: set(files referring to it)} """
+        index = dict()
+        for filename, entry in self.files.items():
+            for path in entry["references"]:
+                index.setdefault(path, set()).add(filename)
+        return index
+
+    def stale_files(self, filenames):
+        """
+        Returns the files (absolute paths) that must be re-checked: those that
+        are new, changed or failed last time, plus all files referring to a
+        changed or deleted file (missing files are always re-checked)
+        """
+        hashes = {f: file_hash(f) if os.path.isfile(f) else None
+                  for f in filenames}
+        changed = set(
+            f for f, h in hashes.items()
+            if f not in self.files or self.files[f]["hash"] != h
+        )
+        failed = set(
+            f for f in hashes if f in self.files and not self.files[f]["valid"]
+        )
+        deleted = set(f for f in self.files if not os.path.isfile(f))
+        index = self.referrers()
+        stale = changed | failed
+        todo = list(changed | deleted)
+        while todo:
+            for referrer in index.get(todo.pop(), ()):
+                if referrer not in stale and referrer in hashes:
+                    stale.add(referrer)
+                    todo.append(referrer)
+        return [f for f in filenames if f in stale]
+
+    def run(self, filenames, n_jobs=None, format=None, type=None):
+        """
+        Re-checks the stale files among filenames and saves the new state
+
+        Checking a file means validating it against its schema and verifying
+        that all the files it references exist.
+        format, type: force the format and type of all files (see
+                      info_files.validate_files())
+        Returns the ValidationReports of the checked files
+        """
+        filenames = [os.path.abspath(f) for f in filenames]
+        stale = self.stale_files(filenames)
+        reports = validate_files(stale, format=format, type=type,
+                                 n_jobs=n_jobs) if stale else []
+        for report in reports:
+            references = []
+            if report.parse_error:  # Already reported, no references to read
+                element = None
+            else:
+                element = read_json_yaml(report.filename, format=format)
+            for ref, path in referenced_files(report.filename, element):
+                references.append(path)
+                if not os.path.isfile(path):
+                    report.errors.append(
+                        (["$ref"], f'referenced file "{ref}" not found')
+                    )
+            if not os.path.isfile(report.filename):
+                continue
+            self.files[report.filename] = dict(
+                hash=file_hash(report.filename),
+                valid=report.valid,
+                references=sorted(set(references)),
+            )
+        for filename in [f for f in self.files if not os.path.isfile(f)]:
+            del self.files[filename]
+        self.save()
+        return reports
+
+    def save(self):
+        """ Writes the state file """
+        write_atomic(
+            self.state_file,
+            json.dumps(dict(schema_version=schema_version(), files=self.files)),
+        )
+
+
+################################################################################
+class build_manifest:
+    """ Inputs of the StationXML files in a directory, kept between runs
+
+    The manifest file (".obsinfo_manifest.json" in the output directory) records, for each
+    StationXML file, the inputs of each of its stations (see
+    network.build_inputs()).  A file is up to date if it exists and all of
+    its stations have the same inputs as when it was written.
+    """
+
+    filename = ".obsinfo_manifest.json"
+
+    def __init__(self, directory=None):
+        self.directory = directory or "."
+        self.outputs = dict()
+        try:
+            with open(os.path.join(self.directory, self.filename), "r") as f:
+                self.outputs = json.load(f)["outputs"]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    def __repr__(self):
+        return "<build_manifest: {}, {:d} files>".format(
+            self.directory, len(self.outputs)
+        )
+
+    def is_current(self, output, inputs):
+        """
+        True if output (a file name in the directory) exists and was written
+        from the same inputs ({station code: build inputs})
+        """
+        return (os.path.isfile(os.path.join(self.directory, output))
+                and self.outputs.get(output, None) == inputs)
+
+    def record(self, output, inputs):
+        """ Records the inputs that output was written from """
+        self.outputs[output] = inputs
+
+    def save(self):
+        """ Writes the manifest file """
+        write_atomic(
+            os.path.join(self.directory, self.filename),
+            json.dumps(dict(obsinfo_version=__version__, outputs=self.outputs),
+                       indent=1, sort_keys=True),
+        )
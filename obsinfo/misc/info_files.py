@@ -3,17 +3,39 @@ Validate information files
 
 """
 # Standard library modules
+import atexit
+import copy
+import glob
 import json
 import pprint
 import os.path
 import sys
+import threading
+import time
 import pkg_resources
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 
 # Non-standard modules
 import jsonschema
 import jsonref
 import yaml
 
+# obsinfo modules
+from .disk_cache import validation_ledger, parsed_file_cache, file_hash
+from ..version import __version__
+
+# Use the libyaml-based C loader when PyYAML was built with it (same results,
+# several times faster)
+try:
+    from yaml import CSafeLoader as YAMLLoader
+except ImportError:
+    from yaml import SafeLoader as YAMLLoader
+
+# Identifies the parser that produced cached parse results
+PARSER_VERSION = f"{__version__}-pyyaml{yaml.__version__}-{YAMLLoader.__name__}"
+_parse_cache = parsed_file_cache(PARSER_VERSION)
+
 root_symbol = "#"
 VALID_FORMATS = ["JSON", "YAML"]
 VALID_TYPES = [
@@ -42,89 +64,198 @@ def get_information_file_type(filename):
     Determines the type of a file, assuming that the filename is "*.{TYPE}.{SOMETHING}
     """
 
-    the_type = filename.split(".")[-2].split("/")[-1].lower()
+    the_type = _file_type(filename)
     if the_type in VALID_TYPES:
         return the_type
     print(f"Unknown type: {the_type}")
     sys.exit(1)
 
 
+def _file_type(filename):
+    """ Returns the {TYPE} part of "*.{TYPE}.{SOMETHING}" (valid or not) """
+    parts = os.path.basename(filename).split(".")
+    return parts[-2].lower() if len(parts) >= 2 else ""
+
+
 ################################################################################
-def validate(filename, format=None, type=None, verbose=False, quiet=False):
+_schema_validators = dict()
+_schema_lock = threading.Lock()
+# jsonref resolves "$ref"s lazily, which is not thread-safe: validations are
+# run one at a time
+_validation_lock = threading.Lock()
+
+
+def schema_file(type):
+    """ Returns the full path of the JSON schema file for an information file type """
+    return pkg_resources.resource_filename(
+        "obsinfo", f"data/schemas/{type}.schema.json"
+    )
+
+
+def get_schema_validator(type):
     """
-    Validates a YAML or JSON file against schema
-    type: "network", "instrumentation","response", "instrument_components","filter"
-    format: "JSON" or "YAML"
-    
-    if type and/or format are not provided, tries to figure them out from the
-    filename, which should be "*{TYPE}.{FORMAT}
+    Returns a ready jsonschema validator for an information file type
+
+    Each schema file (and its $ref graph) is read, resolved and compiled only
+    once per process: later calls return the same validator.
+    Raises an exception if the schema file cannot be loaded
     """
+    with _schema_lock:
+        if type not in _schema_validators:
+            fname = schema_file(type)
+            base_uri = f"file://{os.path.dirname(fname)}/"
+            with open(fname, "r") as f:
+                schema = jsonref.loads(f.read(), base_uri=base_uri, jsonschema=True)
+            # ASSUMES SCHEMA IS DRAFT-04 (I couldn't get it to work otherwise)
+            _schema_validators[type] = jsonschema.Draft4Validator(schema)
+        return _schema_validators[type]
 
-    if quiet:
-        verbose = False
 
-    if not type:
-        type = get_information_file_type(filename)
+################################################################################
+class ValidationReport:
+    """ Result of validating one information file against its schema
+
+    Attributes:
+        filename: the validated file
+        type: information file type (schema used)
+        errors: list of (path, message) tuples, path being a list of keys
+        schema_error: message if the schema itself could not be loaded
+        parse_error: message if the file could not be read
+        elapsed: validation time (seconds)
+    """
 
-    instance = read_json_yaml(filename, format=format)
+    def __init__(self, filename, type=None):
+        self.filename = filename
+        self.type = type
+        self.errors = []
+        self.schema_error = None
+        self.parse_error = None
+        self.elapsed = None
+
+    def __repr__(self):
+        return "<ValidationReport: {}, type={}, {}>".format(
+            self.filename, self.type, "OK" if self.valid else "FAILED"
+        )
 
-    SCHEMA_FILE = pkg_resources.resource_filename(
-        "obsinfo", f"data/schemas/{type}.schema.json"
-    )
-    base_path = os.path.dirname(SCHEMA_FILE)
-    base_uri = f"file://{base_path}/"
-    with open(SCHEMA_FILE, "r") as f:
-        try:
-            schema = jsonref.loads(f.read(), base_uri=base_uri, jsonschema=True)
-        except json.decoder.JSONDecodeError as e:
-            print(f"JSONDecodeError: Error loading JSON schema file: {SCHEMA_FILE}")
-            print(str(e))
-            return False
-        except:
-            print(f"Error loading JSON schema file: {SCHEMA_FILE}")
-            print(sys.exc_info()[1])
-            return False
-
-    # Lazily report all errors in the instance
-    # ASSUMES SCHEMA IS DRAFT-04 (I couldn't get it to work otherwise)
-    try:
-        if verbose:
-            print(f"instance = {filename}")
-        elif not quiet:
-            print(f"instance = {filename} ... ", end="")
+    @property
+    def valid(self):
+        """ True if the file conforms to its schema """
+        return (self.schema_error is None and self.parse_error is None
+                and not self.errors)
 
-        if verbose:
-            print(f"schema =   {os.path.basename(SCHEMA_FILE)}")
-            print("\tTesting schema ...", end="")
+    def error_lines(self):
+        """ Returns one string per error: "['key1']['key2']: message" """
+        return [
+            "".join(f"['{elem}']" for elem in path) + f": {message}"
+            for path, message in self.errors
+        ]
 
-        v = jsonschema.Draft4Validator(schema)
+    def print(self, verbose=False, quiet=False):
+        """ Prints the report, in the format used by obsinfo-validate
 
+            quiet: only print if the file failed validation
+        """
+        if quiet:
+            verbose = False
+            if self.valid:
+                return
+        if self.schema_error or self.parse_error:
+            print(self.schema_error or self.parse_error)
+            return
         if verbose:
-            print("OK")
+            print(f"instance = {self.filename}")
+            print(f"schema =   {os.path.basename(schema_file(self.type))}")
             print("\tTesting instance ...", end="")
-        if not v.is_valid(instance):
-            if quiet:
-                # IF HAVE TO PRINT ERROR MESSAGE, PRINT INTRO TOO
-                print(f"instance = {filename}")
-            else:
-                print("")
-            for error in sorted(v.iter_errors(instance), key=str):
-                print("\t\t", end="")
-                for elem in error.path:
-                    print(f"['{elem}']", end="")
-                print(f": {error.message}")
-            print("\tFAILED")
+        elif quiet:
+            print(f"instance = {self.filename}")
         else:
-            if not quiet:
-                print("OK")
-    except jsonschema.ValidationError as e:
-        if quiet:
-            # IF HAVE TO PRINT ERROR MESSAGE, PRINT INTRO TOO
-            print(f"instance = {filename}")
+            print(f"instance = {self.filename} ... ", end="")
+        if self.valid:
+            print("OK")
         else:
-            print("")
-        print("\t" + e.message)
+            if not quiet:
+                print("")
+            for line in self.error_lines():
+                print("\t\t" + line)
+            print("\tFAILED")
+        if verbose:
+            print("\t({:.3f} s)".format(self.elapsed))
+
+
+def validate_file(filename, format=None, type=None, instance=None):
+    """
+    Validates a YAML or JSON file against schema, without printing anything
+
+    Arguments are as for validate().  The document is traversed only once.
+    Returns a ValidationReport (with a schema_error if type is not given and
+    cannot be found from the filename, or a parse_error if the file cannot be
+    read or parsed)
+    """
+    start = time.perf_counter()
+    if not type:
+        type = _file_type(filename)
+        if type not in VALID_TYPES:
+            report = ValidationReport(filename)
+            report.schema_error = (
+                f'Unknown information file type "{type}": {filename} '
+                "(file names must be *.{TYPE}.json or *.{TYPE}.yaml)"
+            )
+            report.elapsed = time.perf_counter() - start
+            return report
+    report = ValidationReport(filename, type)
 
+    if instance is None:
+        try:
+            instance, report.parse_error = _read_json_yaml(filename,
+                                                           format=format)
+        except OSError as e:
+            report.parse_error = f"Error reading file: {filename}\n{e}"
+        if report.parse_error:
+            report.elapsed = time.perf_counter() - start
+            return report
+
+    try:
+        v = get_schema_validator(type)
+    except json.decoder.JSONDecodeError as e:
+        report.schema_error = (
+            f"JSONDecodeError: Error loading JSON schema file: {schema_file(type)}"
+            f"\n{str(e)}"
+        )
+    except:
+        report.schema_error = (
+            f"Error loading JSON schema file: {schema_file(type)}"
+            f"\n{sys.exc_info()[1]}"
+        )
+    else:
+        try:
+            with _validation_lock:
+                errors = sorted(v.iter_errors(instance), key=str)
+            report.errors = [(list(error.path), error.message) for error in errors]
+        except jsonschema.ValidationError as e:
+            report.errors = [([], e.message)]
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+################################################################################
+def validate(filename, format=None, type=None, verbose=False, quiet=False,
+             instance=None):
+    """
+    Validates a YAML or JSON file against schema and prints the result
+    type: "network", "instrumentation","response", "instrument_components","filter"
+    format: "JSON" or "YAML"
+    instance: already-read contents of filename (avoids re-reading the file)
+    
+    if type and/or format are not provided, tries to figure them out from the
+    filename, which should be "*{TYPE}.{FORMAT}
+
+    Returns False if the schema could not be loaded, True otherwise.  Use
+    validate_file() to get the errors without printing them.
+    """
+    report = validate_file(filename, format=format, type=type, instance=instance)
+    report.print(verbose=verbose, quiet=quiet)
+    if report.schema_error:
+        return False
     return True
 
 
@@ -146,37 +277,251 @@ def get_information_file_format(filename):
 
 
 ##################################################
-def read_json_yaml(filename, format=None, debug=False):
-    """ Reads a JSON or YAML file """
+def read_json_yaml(filename, format=None, debug=False, loader=None):
+    """ Reads a JSON or YAML file
+
+        loader: YAML loader class (default: YAMLLoader, the libyaml C loader
+                if available, otherwise yaml.SafeLoader)
+
+    With the default loader, parse results are also stored in an on-disk
+    cache keyed by content hash, format and PARSER_VERSION, from which
+    unchanged files are later read without parsing (see set_parse_cache())
+    """
+    element, error = _read_json_yaml(filename, format, loader)
+    if error:
+        print(error)
+    return element
+
+
+def _read_json_yaml(filename, format=None, loader=None):
+    """ As read_json_yaml(), but returns (element, error message) instead of
+    printing the error """
     if not format:
         format = get_information_file_format(filename)
+    content_hash = None
+    if loader is None:
+        loader = YAMLLoader
+        if _parse_cache.enabled:
+            content_hash = file_hash(filename)
+            element = _parse_cache.get(content_hash, format)
+            if element is not None:
+                return element, None
 
     with open(filename, "r") as f:
         if format == "YAML":
             try:
-                element = yaml.safe_load(f)
+                element = yaml.load(f, Loader=loader)
             except:
-                print(f"Error loading YAML file: {filename}")
-                print(sys.exc_info()[1])
-                return
+                return None, (f"Error loading YAML file: {filename}\n"
+                              f"{sys.exc_info()[1]}")
         else:
             try:
-                element = json.load(filename)
-            except JSONDecodeError as e:
-                print(f"JSONDecodeError: Error loading JSON file: {filename}")
-                print(str(e))
-                return
+                element = json.load(f)
+            except json.decoder.JSONDecodeError as e:
+                return None, (f"JSONDecodeError: Error loading JSON file: "
+                              f"{filename}\n{str(e)}")
             except:
-                print(f"Error loading JSON file: {filename}")
-                print(sys.exc_info()[1])
-                return
+                return None, (f"Error loading JSON file: {filename}\n"
+                              f"{sys.exc_info()[1]}")
+
+    if content_hash and element is not None:
+        _parse_cache.put(content_hash, element, format)
+    return element, None
+
+
+def set_parse_cache(enabled=True):
+    """ Enables or disables the on-disk cache of parse results """
+    _parse_cache.enabled = enabled
+
+
+################################################################################
+class information_file_cache:
+    """ Process-wide cache of parsed and validated information files
+
+    Entries are keyed by absolute path and checked against the file's
+    modification time and size, so an edited file is re-read automatically.
+    If maxsize is given, the least recently used entries are dropped once
+    the cache holds more than maxsize files.  The cache can be shared between
+    threads.
+    """
+
+    def __init__(self, maxsize=None):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._documents = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return "<information_file_cache: {:d} files, {:d} hits, {:d} misses>".format(
+            len(self._documents), self.hits, self.misses
+        )
+
+    def __len__(self):
+        return len(self._documents)
+
+    @staticmethod
+    def _signature(path):
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def get(self, filename):
+        """ Returns the cached document for filename, or None if absent/stale """
+        path = os.path.abspath(filename)
+        with self._lock:
+            entry = self._documents.get(path, None)
+            if entry is not None and entry[0] == self._signature(path):
+                self._documents.move_to_end(path)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._documents[path]
+            self.misses += 1
+            return None
+
+    def put(self, filename, document):
+        """ Stores a parsed document """
+        path = os.path.abspath(filename)
+        with self._lock:
+            self._documents[path] = (self._signature(path), document)
+            self._documents.move_to_end(path)
+            self._trim()
+
+    def set_maxsize(self, maxsize):
+        """ Changes the maximum number of cached files (None = no limit) """
+        with self._lock:
+            self.maxsize = maxsize
+            self._trim()
+
+    def _trim(self):
+        if self.maxsize is not None:
+            while len(self._documents) > self.maxsize:
+                self._documents.popitem(last=False)
+
+    def invalidate(self, filename=None):
+        """ Removes filename from the cache (or everything if filename is None) """
+        with self._lock:
+            if filename is None:
+                self._documents.clear()
+            else:
+                self._documents.pop(os.path.abspath(filename), None)
+
+    def stats(self):
+        """ Returns a dictionary of cache statistics """
+        return dict(
+            files=len(self._documents),
+            hits=self.hits,
+            misses=self.misses,
+            maxsize=self.maxsize,
+        )
+
+
+_file_cache = information_file_cache()
+
+
+def get_file_cache():
+    """ Returns the process-wide information file cache """
+    return _file_cache
+
+
+def set_file_cache_size(maxsize):
+    """ Sets the maximum number of files in the process-wide cache (None=no limit) """
+    _file_cache.set_maxsize(maxsize)
+
+
+def clear_file_cache(filename=None):
+    """ Empties the process-wide cache (or only removes filename) """
+    _file_cache.invalidate(filename)
 
+
+_ledger = validation_ledger()
+# New ledger entries are written once, when the run ends
+atexit.register(_ledger.save)
+
+
+def get_validation_ledger():
+    """ Returns the on-disk ledger of files that already passed validation """
+    return _ledger
+
+
+def set_revalidate(revalidate=True):
+    """ If True, validate all files even if the ledger says they passed """
+    _ledger.revalidate = revalidate
+
+
+def _validate_unless_ledgered(filename, instance):
+    """
+    Quietly validates an information file, unless a file with identical
+    contents already passed validation against the installed schemas
+    """
+    type = get_information_file_type(filename)
+    content_hash = file_hash(filename)
+    if _ledger.is_validated(content_hash, type):
+        return
+    report = validate_file(filename, type=type, instance=instance)
+    report.print(quiet=True)
+    if report.valid:
+        _ledger.add(content_hash, type)
+
+
+##################################################
+def split_reference(reference, root_symbol=root_symbol):
+    """
+    Splits a file reference into filename and internal path
+
+    "file.yaml#a/b" gives ("file.yaml", "a/b"), "#a/b" gives ("", "a/b") and
+    "file.yaml" or "file.yaml#" give ("file.yaml", "")
+    """
+    if root_symbol in reference:
+        if reference.count(root_symbol) > 1:
+            raise RuntimeError(
+                'More than one occurence of "{}" in file reference "{}"'.format(
+                    root_symbol, reference
+                )
+            )
+        if reference[0] == root_symbol:
+            return "", reference[1:]
+        elif reference[-1] == root_symbol:
+            return reference[0:-1], ""
+        else:
+            A = reference.split(root_symbol)
+            return A[0], A[1]
+    return reference, ""
+
+
+def resolve_path(filename, source_file=None):
+    """
+    Returns the path of filename, relative to source_file if given
+
+    source_file can be the referring file or its directory
+    """
+    if source_file:
+        if os.path.isfile(source_file):
+            source_file = os.path.dirname(source_file)
+        filename = os.path.join(source_file, filename)
+    return filename
+
+
+def get_document(filename, use_cache=True):
+    """
+    Returns the parsed and validated contents of an information file
+
+    The returned document is the one held in the process-wide cache: it must
+    not be modified (load_information_file() returns a modifiable copy)
+    """
+    element = _file_cache.get(filename) if use_cache else None
+    if element is None:
+        element = read_json_yaml(filename)
+        _validate_unless_ledgered(filename, element)
+        if element is not None:
+            _file_cache.put(filename, element)
     return element
 
 
 ##################################################
 def load_information_file(
-    reference, source_file=None, root_symbol=root_symbol, debug=False
+    reference, source_file=None, root_symbol=root_symbol, debug=False,
+    use_cache=True
 ):
     """
     Loads all (or part) of an information file
@@ -196,45 +541,23 @@ def load_information_file(
      - If it is at the end (or absent), then the entire file is loaded 
      
     Based on JSON Pointers
-       
+
+    Parsed files are kept in the process-wide information_file_cache, so each
+    file is only read and validated once (use_cache=False forces a re-read).
+    Files recorded in the validation ledger as having already passed are not
+    re-validated (see set_revalidate()).
+    The returned element is a copy, which the caller is free to modify.
     """
 
     # Figure out filename, absolute path and path inside file
-    filename = None
-    if root_symbol in reference:
-        if reference.count(root_symbol) > 1:
-            raise RuntimeError(
-                'More than one occurence of "{}" in file reference "{}"'.format(
-                    root_symbol, reference
-                )
-            )
-        if reference[0] == root_symbol:
-            filename = ""
-            internal_path = reference[1:]
-        elif reference[-1] == root_symbol:
-            filename = reference[0:-1]
-            internal_path = ""
-        else:
-            A = reference.split(root_symbol)
-            filename = A[0]
-            internal_path = A[1]
-    else:
-        filename = reference
-        internal_path = ""
+    filename, internal_path = split_reference(reference, root_symbol)
     if debug:
         print(
             "LOAD_INFORMATION_FILE(): reference={}, source_file={}".format(
                 reference, source_file
             )
         )
-    if source_file:
-        if os.path.isfile(source_file):
-            current_path = os.path.dirname(source_file)
-        else:
-            current_path = source_file
-        filename = os.path.join(current_path, filename)
-    else:
-        current_path = os.getcwd()
+    filename = resolve_path(filename, source_file)
     if debug:
         print(
             "LOAD_INFORMATION_FILE(): filename={}, internal_path={}".format(
@@ -242,11 +565,8 @@ def load_information_file(
             )
         )
 
-    # MAKE SURE THAT IT CONFORMS TO SCHEMA
-    validate(filename, quiet=True)
-
-    # READ IN FILE
-    element = read_json_yaml(filename)
+    # READ IN FILE AND MAKE SURE THAT IT CONFORMS TO SCHEMA
+    element = get_document(filename, use_cache=use_cache)
 
     # BREAK OUT THE REQUESTED PART
     if internal_path:
@@ -259,6 +579,7 @@ def load_information_file(
                 )
             else:
                 element = element[key]
+    element = copy.deepcopy(element)
 
     # RETURN RESULT
     if debug:
@@ -266,21 +587,114 @@ def load_information_file(
     return element, os.path.abspath(os.path.dirname(filename))
 
 
+################################################################################
+def is_information_file(filename):
+    """ True if filename looks like "*.{TYPE}.{FORMAT}" with a valid type and format """
+    parts = os.path.basename(filename).split(".")
+    return (
+        len(parts) >= 2
+        and parts[-1].upper() in VALID_FORMATS
+        and parts[-2].lower() in VALID_TYPES
+    )
+
+
+def find_information_files(paths):
+    """
+    Returns the information files designated by a list of paths
+
+    Each path can be a file, a directory (searched recursively for
+    information files) or a glob pattern (whose matches that are not named
+    like information files are ignored)
+    """
+    filenames = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                filenames.extend(
+                    os.path.join(root, f) for f in sorted(files)
+                    if is_information_file(f)
+                )
+        elif glob.has_magic(path):
+            filenames.extend(
+                f for f in sorted(glob.glob(path, recursive=True))
+                if os.path.isfile(f) and is_information_file(f)
+            )
+        else:
+            filenames.append(path)
+    # Remove duplicates, keeping order
+    return list(OrderedDict.fromkeys(filenames))
+
+
+def _init_validation_worker():
+    """ Compiles all schemas once in each validation worker process """
+    for type in VALID_TYPES:
+        get_schema_validator(type)
+
+
+def validate_files(filenames, format=None, type=None, n_jobs=None):
+    """
+    Validates many information files, using a pool of n_jobs processes
+
+    n_jobs: number of processes (default: number of CPUs, 1 = no pool)
+    Returns a list of ValidationReports, in the order of filenames (files
+    whose type is unknown get a failed report)
+    """
+    if n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+    n_jobs = min(n_jobs, len(filenames))
+    types = [type] * len(filenames)
+    if n_jobs <= 1:
+        return [validate_file(f, format=format, type=t)
+                for f, t in zip(filenames, types)]
+    # Compile schemas before starting the pool, so forked workers share them
+    _init_validation_worker()
+    with ProcessPoolExecutor(
+        max_workers=n_jobs, initializer=_init_validation_worker
+    ) as executor:
+        return list(
+            executor.map(validate_file, filenames, [format] * len(filenames), types)
+        )
+
+
+def print_validation_summary(reports):
+    """ Prints a one-line-per-file table of validation results """
+    width = max([len(r.filename) for r in reports] + [4])
+    print("{:<{w}}  {:<21}  {:<6}  {:>6}  {:>8}".format(
+        "FILE", "TYPE", "STATUS", "ERRORS", "TIME (s)", w=width))
+    for r in reports:
+        print("{:<{w}}  {:<21}  {:<6}  {:>6d}  {:8.3f}".format(
+            r.filename, r.type or "?", "OK" if r.valid else "FAILED",
+            len(r.errors), r.elapsed, w=width))
+    n_failed = len([r for r in reports if not r.valid])
+    print(f"{len(reports):d} files validated, {n_failed:d} failed")
+
+
 ################################################################################
 def _validate_script(argv=None):
     """
-    Validate an obsinfo information file
+    Validate obsinfo information files
 
-    Validates a file named *.{TYPE}.json or *.{TYPE}.yaml against the 
+    Validates files named *.{TYPE}.json or *.{TYPE}.yaml against the 
     obsinfo schema.{TYPE}.json file.
 
-    {TYPE} can be campaign, network, instrumentation, instrument_components or
-    response
+    {TYPE} can be campaign, network, instrumentation, instrument_components,
+    response or filter
+
+    Directories are searched recursively for information files.  If more than
+    one file is validated, prints a summary table.  Exits with status 1 if any
+    file fails validation.
+
+    With --incremental, only files that changed since the last incremental
+    run, and the files referring to them, are checked.
     """
     from argparse import ArgumentParser
 
     parser = ArgumentParser(prog="obsinfo-validate", description=__doc__)
-    parser.add_argument("info_file", help="Information file")
+    parser.add_argument(
+        "info_files", nargs="+",
+        help="Information file(s), directories or glob patterns"
+    )
     parser.add_argument(
         "-t",
         "--type",
@@ -295,9 +709,46 @@ def _validate_script(argv=None):
         default=None,
         help="Forces information file format (overrides interpreting from filename)",
     )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=None,
+        help="number of validation processes (default: number of CPUs)"
+    )
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="only check files changed since the last incremental run, "
+        "and the files that refer to them"
+    )
     parser.add_argument(
         "-v", "--verbose", action="store_true", help="increase output verbosiy"
     )
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
-    validate(args.info_file, format=args.format, type=args.type, verbose=args.verbose)
+    filenames = find_information_files(args.info_files)
+    if not filenames:
+        print("No information files found")
+        sys.exit(1)
+    if args.incremental:
+        from .incremental import incremental_validation
+
+        reports = incremental_validation().run(
+            filenames, n_jobs=args.jobs, format=args.format, type=args.type
+        )
+        print(
+            "{:d} files unchanged, {:d} checked".format(
+                len(filenames) - len(reports), len(reports)
+            )
+        )
+        if not reports:
+            return
+    else:
+        reports = validate_files(
+            filenames, format=args.format, type=args.type, n_jobs=args.jobs
+        )
+    if len(reports) == 1:
+        reports[0].print(verbose=args.verbose)
+    else:
+        for report in reports:
+            report.print(verbose=args.verbose, quiet=not args.verbose)
+        print_validation_summary(reports)
+    if not all(r.valid for r in reports):
+        sys.exit(1)
@@ -11,6 +11,7 @@ nomenclature:
 I need to modify the code so that it treats a $ref as a placeholder for the associated object
 """
 # Standard library modules
+import functools
 import math as m
 import os.path
 import sys
@@ -24,7 +25,6 @@ from obspy.core.utcdatetime import UTCDateTime
 ################################################################################
 # Miscellaneous Routines
 
-
 def calc_norm_factor(zeros, poles, norm_freq, pz_type, debug=False):
     """
     Calculate the normalization factor for give poles-zeros
@@ -36,28 +36,34 @@ def calc_norm_factor(zeros, poles, norm_freq, pz_type, debug=False):
 
     for s_f=i*2pi*f if the transfer function is in radians
             i*f     if the transfer funtion is in Hertz
+
+    Results are remembered for the last 1024 different poles-zeros
     """
+    A0 = _norm_factor(tuple(complex(z) for z in zeros),
+                      tuple(complex(p) for p in poles),
+                      float(norm_freq), pz_type)
+    if debug:
+        print("poles=", poles, ", zeros=", zeros, "f={:g}, A0={:g}".format(norm_freq, A0))
+    return A0
 
-    A0 = 1.0 + 1j * 0.0
+
+@functools.lru_cache(maxsize=1024)
+def _norm_factor(zeros, poles, norm_freq, pz_type):
     if pz_type == "LAPLACE (HERTZ)":
         s = 1j * norm_freq
     elif pz_type == "LAPLACE (RADIANS/SECOND)":
         s = 1j * 2 * m.pi * norm_freq
     else:
-        print(
-            "Don't know how to calculate normalization factor for z-transform poles and zeros!"
+        raise ValueError(
+            "Don't know how to calculate normalization factor for "
+            "z-transform poles and zeros!"
         )
+    A0 = 1.0 + 1j * 0.0
     for p in poles:
         A0 = A0 * (s - p)
     for z in zeros:
         A0 = A0 / (s - z)
-
-    if debug:
-        print("poles=", poles, ", zeros=", zeros, "s={:g}, A0={:g}".format(s, A0))
-
-    A0 = abs(A0)
-
-    return A0
+    return abs(A0)
 
 
 ##################################################
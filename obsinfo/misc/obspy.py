@@ -11,7 +11,9 @@ nomenclature:
 I need to modify the code so that it treats a $ref as a placeholder for the associated object
 """
 # Standard library modules
+import functools
 import math as m
+import hashlib
 import json
 import pprint
 import os.path
@@ -25,12 +27,46 @@ import obspy.core.inventory.util as obspy_util
 from obspy.core.utcdatetime import UTCDateTime
 
 from .misc import calc_norm_factor
+from . import sensitivity as oi_sensitivity
 from ..network.util import create_comments
 
+################################################################################
+# Shared FIR coefficients
+
+@functools.lru_cache(maxsize=256)
+def _fir_coefficients(values):
+    """
+    Returns the obspy FilterCoefficients of a FIR filter (values: tuple of
+    floats), made once and shared by all stages using the filter
+    """
+    return tuple(inventory.response.FilterCoefficient(x) for x in values)
+
+
 ################################################################################
 # OBSPY-specific
 
-last_output = None
+# Overall sensitivity calculator: "numpy" (misc.sensitivity) or "obspy"
+# (evalresp)
+sensitivity_engine = "numpy"
+
+
+def set_sensitivity_engine(engine):
+    """ Selects the overall sensitivity calculator ("numpy" or "obspy") """
+    global sensitivity_engine
+    if engine not in ("numpy", "obspy"):
+        raise ValueError(f'Unknown sensitivity engine "{engine}"')
+    sensitivity_engine = engine
+
+
+def response_fingerprint(my_responses):
+    """
+    Returns a hash of the response stage definitions of a channel and of the
+    sensitivity engine that calculates its overall sensitivity
+    """
+    text = json.dumps([sensitivity_engine, my_responses], sort_keys=True,
+                      default=str)
+    return hashlib.sha256(text.encode()).hexdigest()
+
 def response_with_sensitivity(resp_stages, sensitivity, debug=False):
 
     true_sensitivity_input_units = None
@@ -52,7 +88,14 @@ def response_with_sensitivity(resp_stages, sensitivity, debug=False):
     )
     # response.plot(min_freq=0.001)
     guesstimate = response.instrument_sensitivity.value
-    response.recalculate_overall_sensitivity(sensitivity["freq"])
+    if sensitivity_engine == "numpy":
+        try:
+            oi_sensitivity.recalculate_overall_sensitivity(
+                response, sensitivity["freq"])
+        except (TypeError, ValueError):  # A stage type it can't evaluate
+            response.recalculate_overall_sensitivity(sensitivity["freq"])
+    else:
+        response.recalculate_overall_sensitivity(sensitivity["freq"])
     if debug:
         calculated = response.instrument_sensitivity.value
         print(
@@ -69,314 +112,352 @@ def response_with_sensitivity(resp_stages, sensitivity, debug=False):
     return response
 
 
-def response(my_responses, debug=False):
+def response(my_responses, debug=False, cache=None):
     """
     Create an obspy response object from a response_yaml-based list of stages
+
+    cache: dict in which to share built responses, by response_fingerprint(),
+           so that channels with the same stages share one Response object,
+           which must not be modified
     """
-    global last_output
-    resp_stages = []
-    i_stage = 0
-    sensitivity = dict()
-    if debug:
-        print(len(my_responses), "stages") #??
-    #delay_correction = my_response.get("delay_correction",False)
-    nbrS = get_nb_stages(my_responses)
-    for my_response in my_responses:
-        # temporary
-        if my_response['decimation_info'] :
-            key_with_p = [k for k in my_response['decimation_info'].keys() if '.' in k ]
-            if len(key_with_p) !=0:
-                delay_correction = my_response['decimation_info'][key_with_p[0]]
-            else:
-                delay_correction = my_response['decimation_info']['delay_correction'] if my_response['decimation_info'] else False
-            if 'input_sample_rate' in my_response['decimation_info']:
-                last_output = my_response['decimation_info']['input_sample_rate'] 
-        decimation_info = my_response['decimation_info'] if 'decimation_info' in my_response else None
+    if cache is None:
+        return ResponseBuilder(my_responses).build(debug)
+    fingerprint = response_fingerprint(my_responses)
+    if fingerprint not in cache:
+        cache[fingerprint] = ResponseBuilder(my_responses).build(debug)
+    return cache[fingerprint]
+
+
+def get_nb_stages(responses):
+    s = 0
+    for i in responses:
+        s = s + len(i['stages'])
+    return s
+
 
-        for stage in my_response['stages']:
+################################################################################
+class ResponseBuilder:
+    """
+    Builds the obspy Response of one channel
+
+    Inputs:
+        my_responses: list of the responses of a channel's components, each
+                      a response_yaml-based {'decimation_info', 'stages'} dict
+
+    All the state needed to build the stages is calculated up front, for the
+    whole stage list, and kept in the builder, so Responses can be built in
+    any order and from several threads:
+        stages: list of (stage, delay_correction) tuples
+        input_sample_rates: decimation input sample rate of each stage, from
+                            the "input_sample_rate" of its component's
+                            decimation_info and the decimation factors of the
+                            preceding stages (None if not applicable)
+    """
+
+    def __init__(self, my_responses):
+        self.my_responses = my_responses
+        self.n_stages = get_nb_stages(my_responses)
+        self.stages = []
+        self.input_sample_rates = []
+        delay_correction = None
+        for my_response in my_responses:
+            decimation_info = my_response.get('decimation_info', None)
+            sample_rate = None
+            if decimation_info:
+                key_with_p = [k for k in decimation_info.keys() if '.' in k ]
+                if len(key_with_p) !=0:
+                    delay_correction = decimation_info[key_with_p[0]]
+                else:
+                    delay_correction = decimation_info['delay_correction']
+                sample_rate = decimation_info.get('input_sample_rate', None)
+            for stage in my_response['stages']:
+                self.stages.append((stage, delay_correction))
+                if sample_rate is None or "output_sample_rate" in stage \
+                        or not self.__decimates(stage):
+                    self.input_sample_rates.append(None)
+                else:
+                    self.input_sample_rates.append(sample_rate)
+                    sample_rate = sample_rate / int(stage.get("decimation_factor", 1))
+
+    def __repr__(self):
+        return "<ResponseBuilder: {:d} stages>".format(self.n_stages)
+
+    @staticmethod
+    def __decimates(stage):
+        """ True if the stage is made with decimation parameters
+            (__make_coefficients() only uses them for "digital" filters,
+            which a "COEFFICIENTS" filter never is) """
+        return stage["filter"]["type"] in ("FIR", "AD_CONVERSION")
+
+    def build(self, debug=False):
+        """ Returns the obspy Response, with its overall sensitivity """
+        resp_stages = []
+        sensitivity = dict()
+        if debug:
+            print(len(self.my_responses), "stages") #??
+        nbrS = self.n_stages
+        for i, (stage, delay_correction) in enumerate(self.stages):
             # DEFINE COMMON VALUES
-            i_stage = i_stage + 1
-            #         if debug:
-            #             print("stage=",end='')
-            #             print(yaml.dump(stage))
+            i_stage = i + 1
+            input_sample_rate = self.input_sample_rates[i]
 
-            units, sensitivity = __get_units_sensitivity(stage, sensitivity, i_stage)
+            units, sensitivity = self.__get_units_sensitivity(stage, sensitivity, i_stage)
 
             resp_type = stage["filter"]["type"]
             if debug:
                 print("i_stage=", i_stage, ", resp_type=", resp_type)
             # Create and append the appropriate response
             if resp_type == "PolesZeros":
-                resp_stages.append(__make_poles_zeros(stage, i_stage, units))
+                resp_stages.append(self.__make_poles_zeros(stage, i_stage, units))
             elif resp_type == "COEFFICIENTS":
-                resp_stages.append(__make_coefficients(stage, i_stage, units, delay_correction, decimation_info, nbrS))
+                resp_stages.append(self.__make_coefficients(stage, i_stage, units, delay_correction, input_sample_rate, nbrS))
             elif resp_type == "FIR":
-                resp_stages.append(__make_FIR(stage, i_stage, units, delay_correction, decimation_info, nbrS))
+                resp_stages.append(self.__make_FIR(stage, i_stage, units, delay_correction, input_sample_rate, nbrS))
             elif resp_type == "AD_CONVERSION":
-                resp_stages.append(__make_DIGITAL(stage, i_stage, units, decimation_info))
+                resp_stages.append(self.__make_DIGITAL(stage, i_stage, units, input_sample_rate))
             elif resp_type == "ANALOG":
-                resp_stages.append(__make_ANALOG(stage, i_stage, units))
+                resp_stages.append(self.__make_ANALOG(stage, i_stage, units))
             else:
                 raise TypeError("UNKNOWN STAGE RESPONSE TYPE: {}".format(resp_type))
-    response = response_with_sensitivity(resp_stages, sensitivity)
-    if debug:
-        print(response)
-    return response
-
-
-def get_nb_stages(responses):
-    s = 0
-    for i in responses:
-        s = s + len(i['stages'])
-    return s
-
+        response = response_with_sensitivity(resp_stages, sensitivity)
+        if debug:
+            print(response)
+        return response
+
+    def __get_units_sensitivity(self, stage, sensitivity, i_stage):
+        # Get Units
+
+        units = dict()
+        temp = stage.get("input_units", {})
+        units["input"] = temp.get("name", None)
+        units["input_description"] = temp.get("description", None)
+
+        temp = stage.get("output_units", {})
+        units["output"] = temp.get("name", None)
+        units["output_description"] = temp.get("description", None)
+
+        # Set Sensitivity
+        gain_value, gain_frequency = self.__get_gain(stage)
+        if i_stage == 1:
+            sensitivity = {
+                "input_units": units["input"],
+                "input_units_description": units["input_description"],
+                "freq": gain_frequency,
+                "guess": gain_value,
+            }
 
-
-def __get_units_sensitivity(stage, sensitivity, i_stage):
-    # Get Units
-    
-    units = dict()
-    temp = stage.get("input_units", {})
-    units["input"] = temp.get("name", None)
-    units["input_description"] = temp.get("description", None)
-
-    temp = stage.get("output_units", {})
-    units["output"] = temp.get("name", None)
-    units["output_description"] = temp.get("description", None)
-
-    # Set Sensitivity
-    gain_value, gain_frequency = __get_gain(stage)
-    if i_stage == 1:
-        sensitivity = {
-            "input_units": units["input"],
-            "input_units_description": units["input_description"],
-            "freq": gain_frequency,
-            "guess": gain_value,
-        }
-
-    else:
-        sensitivity["guess"] = sensitivity["guess"] * gain_value
-    if units["output"]:
-        sensitivity["output_units"] = units["output"]
-        sensitivity["output_units_description"] = units["output_description"]
-
-    return units, sensitivity
-
-
-def __make_poles_zeros(stage, i_stage, units, debug=False):
-    gain_value, gain_frequency = __get_gain(stage)
-    resp = stage["filter"]
-    lstr = resp["units"].lower()
-    if "hertz" in lstr or "hz" in lstr:
-        pz_type = "LAPLACE (HERTZ)"
-    elif "z-transform" in lstr or "digital" in lstr:
-        pz_type = "DIGITAL (Z-TRANSFORM)"
-    elif "rad" in lstr:
-        pz_type = "LAPLACE (RADIANS/SECOND)"
-    else:
-        raise ValueError('Unknown PoleZero response type: "{}"'.format(lstr))
-    zeros = [
-        obspy_types.ComplexWithUncertainties(
-            float(t[0]) + 1j * float(t[1]), lower_uncertainty=0.0, upper_uncertainty=0.0
-        )
-        for t in resp["zeros"]
-    ]
-    poles = [
-        obspy_types.ComplexWithUncertainties(
-            float(t[0]) + 1j * float(t[1]), lower_uncertainty=0.0, upper_uncertainty=0.0
-        )
-        for t in resp["poles"]
-    ]
-    if gain_frequency == 0:
-        norm_freq = 1.0
-    else:
-        norm_freq = gain_frequency
-    norm_factor = resp.get(
-        "normalization_factor", calc_norm_factor(zeros, poles, norm_freq, pz_type)
-    )
-    if debug:
-        print(
-            "  Z=",
-            zeros,
-            " P=",
-            poles,
-            " A0={:g} at {:g} Hz".format(norm_factor, norm_freq),
+        else:
+            sensitivity["guess"] = sensitivity["guess"] * gain_value
+        if units["output"]:
+            sensitivity["output_units"] = units["output"]
+            sensitivity["output_units_description"] = units["output_description"]
+
+        return units, sensitivity
+
+    def __make_poles_zeros(self, stage, i_stage, units, debug=False):
+        gain_value, gain_frequency = self.__get_gain(stage)
+        resp = stage["filter"]
+        lstr = resp["units"].lower()
+        if "hertz" in lstr or "hz" in lstr:
+            pz_type = "LAPLACE (HERTZ)"
+        elif "z-transform" in lstr or "digital" in lstr:
+            pz_type = "DIGITAL (Z-TRANSFORM)"
+        elif "rad" in lstr:
+            pz_type = "LAPLACE (RADIANS/SECOND)"
+        else:
+            raise ValueError('Unknown PoleZero response type: "{}"'.format(lstr))
+        zeros = [
+            obspy_types.ComplexWithUncertainties(
+                float(t[0]) + 1j * float(t[1]), lower_uncertainty=0.0, upper_uncertainty=0.0
+            )
+            for t in resp["zeros"]
+        ]
+        poles = [
+            obspy_types.ComplexWithUncertainties(
+                float(t[0]) + 1j * float(t[1]), lower_uncertainty=0.0, upper_uncertainty=0.0
+            )
+            for t in resp["poles"]
+        ]
+        if gain_frequency == 0:
+            norm_freq = 1.0
+        else:
+            norm_freq = gain_frequency
+        if "normalization_factor" in resp:
+            norm_factor = resp["normalization_factor"]
+        else:
+            norm_factor = calc_norm_factor(zeros, poles, norm_freq, pz_type)
+        if debug:
+            print(
+                "  Z=",
+                zeros,
+                " P=",
+                poles,
+                " A0={:g} at {:g} Hz".format(norm_factor, norm_freq),
+            )
+        return inventory.response.PolesZerosResponseStage(
+            i_stage,
+            gain_value,
+            gain_frequency,
+            units["input"],
+            units["output"],
+            pz_transfer_function_type=pz_type,
+            normalization_frequency=norm_freq,
+            normalization_factor=norm_factor,
+            zeros=zeros,
+            poles=poles,
+            input_units_description=units["input_description"],
+            output_units_description=units["output_description"],
+            description=stage["description"] if "description" in stage else None,
         )
-    return inventory.response.PolesZerosResponseStage(
-        i_stage,
-        gain_value,
-        gain_frequency,
-        units["input"],
-        units["output"],
-        pz_transfer_function_type=pz_type,
-        normalization_frequency=norm_freq,
-        normalization_factor=norm_factor,
-        zeros=zeros,
-        poles=poles,
-        input_units_description=units["input_description"],
-        output_units_description=units["output_description"],
-        description=stage["description"] if "description" in stage else None,
-    )
 
+    def __make_coefficients(self, stage, i_stage, units, delay_correction, input_sample_rate, nbr_stages, debug=False):
+        resp = stage["filter"]
+        gain_value, gain_frequency = self.__get_gain(stage)
+        decim = {"delay": None, "factor": 1, "offset": None, "input_sr": None}
+        correction = None
+        if resp["type"].lower() == "hertz":
+            cf_type = "ANALOG (HERTZ)"
+        elif resp["type"].lower() == "digital":
+            cf_type = "DIGITAL"
+            decim = self.__get_decim_parms(stage, input_sample_rate)
+            if delay_correction is True:
+                correction = decim["delay"]
+            elif type(delay_correction) is float and i_stage == nbr_stages:
+                correction = delay_correction
+            else:
+                correction = 0.0
+        else:
+            cf_type = "ANALOG (RADIANS/S)"
+        return inventory.response.CoefficientsTypeResponseStage(
+            i_stage,
+            gain_value,
+            gain_frequency,
+            units["input"],
+            units["output"],
+            cf_type,
+            numerator=float(resp["numerator"]),
+            denominator=float(resp["denominator"]),
+            input_units_description=units["input_description"],
+            output_units_description=units["output_description"],
+            description=stage["description"],
+            decimation_input_sample_rate=decim["input_sr"],
+            decimation_factor=decim["factor"],
+            decimation_offset=decim["offset"],
+            decimation_delay=decim["delay"],
+            decimation_correction=correction,
+        )
 
-def __make_coefficients(stage, i_stage, units, delay_correction, decimation_info,  nbr_stages, debug=False):
-    resp = stage["filter"]
-    gain_value, gain_frequency = __get_gain(stage)
-    decim = {"delay": None, "factor": 1, "offset": None, "input_sr": None}
-    correction = None
-    if resp["type"].lower() == "hertz":
-        cf_type = "ANALOG (HERTZ)"
-    elif resp["type"].lower() == "digital":
-        cf_type = "DIGITAL"
-        decim = __get_decim_parms(stage)
+    def __make_FIR(self, stage, i_stage, units, delay_correction, input_sample_rate, nbr_stages, debug=False):
+        resp = stage["filter"]
+        if debug:
+            print(resp)
+        gain_value, gain_frequency = self.__get_gain(stage)
+        decim = self.__get_decim_parms(stage, input_sample_rate)
         if delay_correction is True:
             correction = decim["delay"]
         elif type(delay_correction) is float and i_stage == nbr_stages:
             correction = delay_correction
         else:
             correction = 0.0
-    else:
-        cf_type = "ANALOG (RADIANS/S)"
-    return inventory.response.CoefficientsTypeResponseStage(
-        i_stage,
-        gain_value,
-        gain_frequency,
-        units["input"],
-        units["output"],
-        cf_type,
-        numerator=float(resp["numerator"]),
-        denominator=float(resp["denominator"]),
-        input_units_description=units["input_description"],
-        output_units_description=units["output_description"],
-        description=stage["description"],
-        decimation_input_sample_rate=decim["input_sr"],
-        decimation_factor=decim["factor"],
-        decimation_offset=decim["offset"],
-        decimation_delay=decim["delay"],
-        decimation_correction=correction,
-    )
+        return inventory.response.FIRResponseStage(
+            i_stage,
+            gain_value,
+            gain_frequency,
+            "counts",
+            "counts",
+            symmetry=resp["symmetry"].upper(),
+            coefficients=_fir_coefficients(
+                tuple(float(x) for x in resp["coefficients"])
+            ),
+            input_units_description="Digital Counts",
+            output_units_description="Digital Counts",
+            description=stage["description"] if "description" in stage else None,
+            decimation_input_sample_rate=decim["input_sr"],
+            decimation_factor=decim["factor"],
+            decimation_offset=decim["offset"],
+            decimation_delay=decim["delay"],
+            decimation_correction=correction,
+        )
 
+    def __make_DIGITAL(self, stage, i_stage, units, input_sample_rate, debug=False):
+        gain_value, gain_frequency = self.__get_gain(stage)
+        decim = self.__get_decim_parms(stage, input_sample_rate)
+        return inventory.response.CoefficientsTypeResponseStage(
+            i_stage,
+            gain_value,
+            gain_frequency,
+            units["input"],
+            units["output"],
+            "DIGITAL",
+            numerator=[
+                obspy_types.FloatWithUncertaintiesAndUnit(
+                    1.0, lower_uncertainty=0.0, upper_uncertainty=0.0
+                )
+            ],
+            denominator=[],
+            input_units_description=units["input_description"],
+            output_units_description=units["output_description"],
+            description=stage["description"] if "description" in stage else None,
+            decimation_input_sample_rate=decim["input_sr"],
+            decimation_factor=decim["factor"],
+            decimation_offset=decim["offset"],
+            decimation_delay=decim["delay"],
+            decimation_correction=float(stage.get("decimation_correction", 0.0)),
+        )
 
-def __make_FIR(stage, i_stage, units, delay_correction, decimation_info, nbr_stages, debug=False):
-    resp = stage["filter"]
-    if debug:
-        print(resp)
-    gain_value, gain_frequency = __get_gain(stage)
-    decim = __get_decim_parms(stage, decimation_info)
-    if delay_correction is True:
-        correction = decim["delay"]
-    elif type(delay_correction) is float and i_stage == nbr_stages:
-        correction = delay_correction
-    else:
-        correction = 0.0
-    return inventory.response.FIRResponseStage(
-        i_stage,
-        gain_value,
-        gain_frequency,
-        "counts",
-        "counts",
-        symmetry=resp["symmetry"].upper(),
-        coefficients=[
-            obspy_types.FloatWithUncertaintiesAndUnit(x) for x in resp["coefficients"]
-        ],
-        input_units_description="Digital Counts",
-        output_units_description="Digital Counts",
-        description=stage["description"] if "description" in stage else None,
-        decimation_input_sample_rate=decim["input_sr"],
-        decimation_factor=decim["factor"],
-        decimation_offset=decim["offset"],
-        decimation_delay=decim["delay"],
-        decimation_correction=correction,
-    )
+    def __make_ANALOG(self, stage, i_stage, units, debug=False):
+        gain_value, gain_frequency = self.__get_gain(stage)
+        # Force to PolesZeros without Poles or Zeros
+        return inventory.response.PolesZerosResponseStage(
+            i_stage,
+            gain_value,
+            gain_frequency,
+            units["input"],
+            units["output"],
+            input_units_description=units["input_description"],
+            output_units_description=units["output_description"],
+            description=stage["description"] if "description" in stage else None,
+            pz_transfer_function_type="LAPLACE (HERTZ)",
+            normalization_frequency=0.0,
+            normalization_factor=1.0,
+            zeros=[],
+            poles=[],
+        )
 
+    #     return inventory.response.ResponseStage(\
+    #             i_stage,
+    #             gain_value, gain_frequency,
+    #             input_units, output_units,
+    #             input_units_description=input_units_description,
+    #             output_units_description=output_units_description,
+    #             description=stage['description']
+    #         )
+
+    def __get_gain(self, stage):
+        gain = stage.get("gain", {})
+        return float(gain.get("value", 1.0)), float(gain.get("frequency", 0.0))
+
+    def __get_decim_parms(self, stage, input_sample_rate):
+        decim = dict()
+        decim["factor"] = int(stage.get("decimation_factor", 1))
+
+        if 'output_sample_rate' in stage:
+            decim["input_sr"] = decim["factor"] * stage["output_sample_rate"]  
+        elif input_sample_rate is not None:
+            decim["input_sr"] = input_sample_rate
+        else:
+            raise RuntimeError(f'Your stage {stage} does not have a "output_sample_rate" ')
 
-def __make_DIGITAL(stage, i_stage, units, decimation_info, debug=False):
-    gain_value, gain_frequency = __get_gain(stage)
-    decim = __get_decim_parms(stage, decimation_info)
-    return inventory.response.CoefficientsTypeResponseStage(
-        i_stage,
-        gain_value,
-        gain_frequency,
-        units["input"],
-        units["output"],
-        "DIGITAL",
-        numerator=[
-            obspy_types.FloatWithUncertaintiesAndUnit(
-                1.0, lower_uncertainty=0.0, upper_uncertainty=0.0
+        filter = stage["filter"]
+        decim["offset"] = int(filter.get("delay.samples", 0))
+        # cas sismob
+        if "delay" in stage:
+            decim["delay"] = stage["delay"]
+        else:
+            decim["delay"] = float(
+                filter.get("delay", float(decim["offset"]) / float(decim["input_sr"]))
             )
-        ],
-        denominator=[],
-        input_units_description=units["input_description"],
-        output_units_description=units["output_description"],
-        description=stage["description"] if "description" in stage else None,
-        decimation_input_sample_rate=decim["input_sr"],
-        decimation_factor=decim["factor"],
-        decimation_offset=decim["offset"],
-        decimation_delay=decim["delay"],
-        decimation_correction=float(stage.get("decimation_correction", 0.0)),
-    )
-
-
-def __make_ANALOG(stage, i_stage, units, debug=False):
-    gain_value, gain_frequency = __get_gain(stage)
-    # Force to PolesZeros without Poles or Zeros
-    return inventory.response.PolesZerosResponseStage(
-        i_stage,
-        gain_value,
-        gain_frequency,
-        units["input"],
-        units["output"],
-        input_units_description=units["input_description"],
-        output_units_description=units["output_description"],
-        description=stage["description"] if "description" in stage else None,
-        pz_transfer_function_type="LAPLACE (HERTZ)",
-        normalization_frequency=0.0,
-        normalization_factor=1.0,
-        zeros=[],
-        poles=[],
-    )
-
-
-#     return inventory.response.ResponseStage(\
-#             i_stage,
-#             gain_value, gain_frequency,
-#             input_units, output_units,
-#             input_units_description=input_units_description,
-#             output_units_description=output_units_description,
-#             description=stage['description']
-#         )
-
-
-def __get_gain(stage):
-    gain = stage.get("gain", {})
-    return float(gain.get("value", 1.0)), float(gain.get("frequency", 0.0))
-
-
-def __get_decim_parms(stage, decimation_info):
-    global last_output
-
-    decim = dict()
-    decim["factor"] = int(stage.get("decimation_factor", 1))
-
-    if 'output_sample_rate' in stage:
-        decim["input_sr"] = decim["factor"] * stage["output_sample_rate"]  
-    elif  decimation_info and 'input_sample_rate' in decimation_info.keys():
-        decim["input_sr"] = last_output
-        last_output = decim["input_sr"] / decim["factor"]
-
-    else:
-        raise RuntimeError(f'Your stage {stage} does not have a "output_sample_rate" ')
-
-    filter = stage["filter"]
-    decim["offset"] = int(filter.get("delay.samples", 0))
-    # cas sismob
-    if "delay" in stage:
-        decim["delay"] = stage["delay"]
-    else:
-        decim["delay"] = float(
-            filter.get("delay", float(decim["offset"]) / float(decim["input_sr"]))
-        )
-    return decim
+        return decim
 
 
 def equipment(equipment, resource_id=None, debug=False):
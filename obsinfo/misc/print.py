@@ -10,8 +10,10 @@ import sys
 # obsinfo modules
 from .info_files import (
     read_json_yaml,
+    validate_file,
     get_information_file_format,
     get_information_file_type,
+    set_revalidate,
     VALID_TYPES,
     VALID_FORMATS,
 )
@@ -33,9 +35,12 @@ def print_summary(filename, format=None, type=None, verbose=False, debug=False):
     if not type:
         type = get_information_file_type(filename)
 
-    instance = read_json_yaml(filename)
+    instance = read_json_yaml(filename, format=format)
 
     print(f"\nFILENAME: {filename}")
+    report = validate_file(filename, format=format, type=type, instance=instance)
+    if not report.valid:
+        report.print()
     if type == "network":
         if debug:
             print("Loading network")
@@ -60,6 +65,12 @@ def _print_summary_network(network, network_file):
     for name, station in network.stations.items():
         print("  " + str(station))
     print("")
+    print("REFERENCED FILES:")
+    network.references.print_summary()
+    print("")
+    print("RESPONSE CHAINS:")
+    network.print_response_chains()
+    print("")
 
 
 ################################################################################
@@ -170,7 +181,12 @@ def _print_script(argv=None):
     parser.add_argument(
         "-v", "--verbose", action="store_true", help="increase output verbosiy"
     )
+    parser.add_argument(
+        "--revalidate", action="store_true",
+        help="validate all referenced files, even those already validated"
+    )
     args = parser.parse_args()
+    set_revalidate(args.revalidate)
 
     print_summary(
         args.info_file, format=args.format, type=args.type, verbose=args.verbose
@@ -0,0 +1,167 @@
+"""
+Resolve the tree of information files referenced (by "$ref") from a root file
+
+network -> instrumentation -> instrument_components -> response -> filter
+"""
+# Standard library modules
+import os.path
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# obsinfo modules
+from .info_files import get_document, split_reference, resolve_path, root_symbol
+
+# Number of threads used to read each level of a reference tree
+prefetch_threads = 8
+
+
+def set_prefetch_threads(n_threads):
+    """ Sets the default number of prefetch threads (0 or 1: read serially) """
+    global prefetch_threads
+    prefetch_threads = n_threads
+
+
+################################################################################
+def find_references(element):
+    """
+    Returns all "$ref" values in an information file element, in document order
+    """
+    refs = []
+    if isinstance(element, dict):
+        if "$ref" in element and isinstance(element["$ref"], str):
+            refs.append(element["$ref"])
+        for key, value in element.items():
+            if key != "$ref":
+                refs.extend(find_references(value))
+    elif isinstance(element, list):
+        for value in element:
+            refs.extend(find_references(value))
+    return refs
+
+
+def referenced_files(filename, element):
+    """
+    Returns (reference, absolute path) for each "$ref" to another file in
+    element (the contents of filename)
+    """
+    files = []
+    for ref in find_references(element):
+        ref_file, internal_path = split_reference(ref, root_symbol)
+        if ref_file:  # Otherwise it's a reference inside the same file
+            files.append((ref, os.path.abspath(
+                os.path.join(os.path.dirname(filename), ref_file))))
+    return files
+
+
+################################################################################
+class reference_tree:
+    """ Dependency graph of the information files referenced from a root file
+
+    Every referenced file is read (and validated) exactly once, through the
+    process-wide information file cache, so the classes built afterwards
+    (network, instrumentation, instrument_components...) get their files
+    from the cache.  "$ref" paths are relative to the referring file.
+    The files of each level of the tree (for example all the response files
+    of a components file) are read concurrently by n_threads threads
+    (default: prefetch_threads), which mostly helps on network filesystems.
+
+    Attributes:
+        root: absolute path of the root file
+        files: ordered dict of {absolute path: referenced paths}
+        references: list of (referring file, referred file) pairs, one per
+                    "$ref" (so including repeats)
+        missing: list of (referring file, "$ref" value) pairs whose file was
+                 not found
+        cycles: list of cycles, each a list of files
+    """
+
+    def __init__(self, filename, referring_file=None, n_threads=None):
+        self.root = os.path.abspath(resolve_path(filename, referring_file))
+        self.files = OrderedDict()
+        self.references = []
+        self.missing = []
+        self.cycles = []
+        if n_threads is None:
+            n_threads = prefetch_threads
+        self.n_threads = n_threads
+        self._resolve()
+        self._find_cycles()
+
+    def __repr__(self):
+        return "<reference_tree: {}, {:d} files, {:d} references>".format(
+            os.path.basename(self.root), len(self.files), len(self.references)
+        )
+
+    def _file_references(self, filename):
+        """ Returns the absolute paths of the files referenced by filename """
+        referred = []
+        for ref, path in referenced_files(filename, get_document(filename)):
+            if not os.path.isfile(path):
+                self.missing.append((filename, ref))
+                continue
+            self.references.append((filename, path))
+            if path not in referred:
+                referred.append(path)
+        return referred
+
+    def _prefetch(self, filenames):
+        """ Reads and parses files concurrently into the information file cache """
+        if self.n_threads > 1 and len(filenames) > 1:
+            with ThreadPoolExecutor(max_workers=self.n_threads) as executor:
+                list(executor.map(get_document, filenames))
+
+    def _resolve(self):
+        """ Reads the tree, one level at a time """
+        level = [self.root]
+        while level:
+            self._prefetch(level)
+            next_level = []
+            for filename in level:
+                self.files[filename] = self._file_references(filename)
+            for filename in level:
+                for path in self.files[filename]:
+                    if path not in self.files and path not in next_level:
+                        next_level.append(path)
+            level = next_level
+
+    def _find_cycles(self):
+        """ Depth-first search for circular references """
+        done = set()
+
+        def visit(filename, stack):
+            stack.append(filename)
+            for path in self.files[filename]:
+                if path in stack:
+                    self.cycles.append(stack[stack.index(path):] + [path])
+                elif path not in done:
+                    visit(path, stack)
+            stack.pop()
+            done.add(filename)
+
+        visit(self.root, [])
+
+    def documents(self):
+        """ Returns {absolute path: document} for all files in the tree """
+        return OrderedDict((f, get_document(f)) for f in self.files)
+
+    def summary(self):
+        """ Returns a dict with the numbers of unique files and of references,
+        plus the lists of missing files and cycles """
+        return dict(
+            n_files=len(self.files),
+            n_references=len(self.references),
+            missing=self.missing,
+            cycles=self.cycles,
+        )
+
+    def print_summary(self):
+        """ Prints the numbers of files and references, and any problems """
+        print(
+            "{:d} unique information files, {:d} references".format(
+                len(self.files), len(self.references)
+            )
+        )
+        for referring, ref in self.missing:
+            print(f'    NOT FOUND: "{ref}" (referenced by {referring})')
+        for cycle in self.cycles:
+            print("    CIRCULAR REFERENCE: " + " -> ".join(cycle))
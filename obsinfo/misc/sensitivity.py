@@ -0,0 +1,212 @@
+"""
+Overall sensitivity of obspy Responses, calculated with NumPy
+
+Replaces obspy's Response.recalculate_overall_sensitivity(), which calls
+evalresp, for the stage types that misc.obspy.response() creates:
+PolesZeros (Laplace or digital), Coefficients (digital or analog), FIR, and
+the ANALOG and AD_CONVERSION stages (gain-only PolesZeros and Coefficients).
+
+As in evalresp, the response of each stage is multiplied by its gain, and
+digital filters without a denominator (FIR) are normalized to a sum of 1.
+No unit conversion is made: the response is evaluated in the input units
+of the first stage.
+"""
+# Standard library modules
+import functools
+
+# Non-standard modules
+import numpy as np
+import obspy.core.inventory.response as obspy_response
+
+
+def _as_array(values):
+    return np.array([float(x) for x in values], dtype=float)
+
+
+@functools.lru_cache(maxsize=256)
+def _fir_array(coefficients, symmetry):
+    """
+    Returns a read-only array of all the coefficients of a FIR filter,
+    expanded from the stored ones (tuple of floats) according to symmetry
+    ("NONE", "ODD" or "EVEN").  Each filter is expanded once.
+    """
+    array = np.array(coefficients, dtype=float)
+    if symmetry == "ODD":
+        array = np.concatenate((array, array[-2::-1]))
+    elif symmetry == "EVEN":
+        array = np.concatenate((array, array[::-1]))
+    array.flags.writeable = False
+    return array
+
+
+def _coefficients(stage):
+    """ Returns the numerator and denominator arrays of a Coefficients stage """
+    return _as_array(stage.numerator), _as_array(stage.denominator)
+
+
+def _fir_coefficients(stage):
+    """ Returns the array of all coefficients of a FIR stage """
+    return _fir_array(tuple(float(x) for x in stage.coefficients),
+                      (stage.symmetry or "NONE").upper())
+
+
+def overall_sensitivities(responses, frequencies):
+    """
+    Returns the overall sensitivities of a batch of obspy Responses
+
+    responses: list of obspy Responses
+    frequencies: frequency (Hz) at which to evaluate each Response, or
+                 one frequency for all
+
+    The stages of all Responses are stacked and evaluated together (see
+    stages_response()), then multiplied per Response
+    """
+    frequencies = np.broadcast_to(np.asarray(frequencies, dtype=float),
+                                  (len(responses),))
+    stages, owners = [], []
+    for i, response in enumerate(responses):
+        stages += response.response_stages
+        owners += [i] * len(response.response_stages)
+    owners = np.array(owners, dtype=int)
+    total = np.ones(len(responses), dtype=complex)
+    np.multiply.at(total, owners, stages_response(stages, frequencies[owners]))
+    return np.abs(total)
+
+
+def stages_response(stages, frequencies):
+    """
+    Returns the complex response of each of a list of obspy response stages,
+    including its gain, at its own frequency (Hz)
+
+    Stages are grouped by kind and each group is evaluated with one set of
+    array operations
+    """
+    frequencies = np.asarray(frequencies, dtype=float)
+    groups = dict()
+    for i, stage in enumerate(stages):
+        groups.setdefault(_stack_evaluator(stage), []).append(i)
+    result = np.empty(len(stages), dtype=complex)
+    for evaluator, indexes in groups.items():
+        result[indexes] = evaluator([stages[i] for i in indexes],
+                                    frequencies[indexes])
+    gains = np.array([stage.stage_gain for stage in stages], dtype=float)
+    return gains * result
+
+
+def _stack_evaluator(stage):
+    """ Returns the function evaluating a stack of stages like stage """
+    if isinstance(stage, obspy_response.PolesZerosResponseStage):
+        return _poles_zeros_stack
+    if isinstance(stage, obspy_response.FIRResponseStage):
+        return _fir_stack
+    if isinstance(stage, obspy_response.CoefficientsTypeResponseStage):
+        if stage.cf_transfer_function_type == "DIGITAL" \
+                and len(_coefficients(stage)[1]) == 0:
+            return _fir_stack
+        return _coefficients_stack
+    raise TypeError("Cannot evaluate {} stages".format(type(stage).__name__))
+
+
+def _padded(arrays, fill=0, dtype=float):
+    """
+    Returns arrays as the rows of one array, padded on the right with fill,
+    and the mask of the values that are not padding
+    """
+    width = max([len(x) for x in arrays] + [0])
+    stack = np.full((len(arrays), width), fill, dtype=dtype)
+    mask = np.zeros((len(arrays), width), dtype=bool)
+    for row, values in enumerate(arrays):
+        stack[row, :len(values)] = values
+        mask[row, :len(values)] = True
+    return stack, mask
+
+
+def _poles_zeros_stack(stages, frequencies):
+    s = np.empty(len(stages), dtype=complex)
+    for i, stage in enumerate(stages):
+        tf_type = stage.pz_transfer_function_type
+        if tf_type == "LAPLACE (RADIANS/SECOND)":
+            s[i] = 2j * np.pi * frequencies[i]
+        elif tf_type == "LAPLACE (HERTZ)":
+            s[i] = 1j * frequencies[i]
+        elif tf_type == "DIGITAL (Z-TRANSFORM)":
+            s[i] = np.exp(2j * np.pi * frequencies[i]
+                          / stage.decimation_input_sample_rate)
+        else:
+            raise ValueError(f'Unknown transfer function type "{tf_type}"')
+    numerator, denominator = [
+        np.prod(np.where(mask, s[:, None] - roots, 1), axis=1)
+        for roots, mask in (
+            _padded([[complex(x) for x in getattr(stage, name)]
+                     for stage in stages], dtype=complex)
+            for name in ("zeros", "poles")
+        )
+    ]
+    factors = np.array([stage.normalization_factor for stage in stages],
+                       dtype=float)
+    return factors * numerator / denominator
+
+
+def _fir_stack(stages, frequencies):
+    """ FIR filters (and digital coefficients without denominator),
+    normalized to 1 at zero frequency """
+    coefficients = []
+    for stage in stages:
+        if isinstance(stage, obspy_response.FIRResponseStage):
+            values = _fir_coefficients(stage)
+        else:
+            values = _coefficients(stage)[0]
+        total = values.sum()
+        coefficients.append(values / total if total != 0 else values)
+    coefficients = _padded(coefficients)[0]
+    sample_rates = np.array(
+        [stage.decimation_input_sample_rate for stage in stages], dtype=float
+    )
+    k = np.arange(coefficients.shape[1])
+    phase = (-2j * np.pi * (frequencies[:, None] * k[None, :])
+             / sample_rates[:, None])
+    return np.einsum("ij,ij->i", np.exp(phase), coefficients)
+
+
+def _coefficients_stack(stages, frequencies):
+    """ Coefficients stages other than digital ones without denominator """
+    x = np.empty(len(stages), dtype=complex)
+    numerators, denominators = [], []
+    for i, stage in enumerate(stages):
+        numerator, denominator = _coefficients(stage)
+        tf_type = stage.cf_transfer_function_type
+        if tf_type == "DIGITAL":
+            x[i] = np.exp(-2j * np.pi * frequencies[i]
+                          / stage.decimation_input_sample_rate)
+        elif tf_type == "ANALOG (RADIANS/SECOND)":
+            x[i] = 2j * np.pi * frequencies[i]
+        elif tf_type == "ANALOG (HERTZ)":
+            x[i] = 1j * frequencies[i]
+        else:
+            raise ValueError(f'Unknown transfer function type "{tf_type}"')
+        if len(denominator) == 0:
+            denominator = np.ones(1)
+        numerators.append(numerator)
+        denominators.append(denominator)
+    return (_polyval_stack(_padded(numerators)[0], x)
+            / _polyval_stack(_padded(denominators)[0], x))
+
+
+def _polyval_stack(coefficients, x):
+    """ Evaluates the polynomials sum(coefficients[i, n] * x[i]**n) """
+    result = np.zeros(len(x), dtype=complex)
+    for column in coefficients.T[::-1]:
+        result = result * x + column
+    return result
+
+
+def recalculate_overall_sensitivity(response, frequency):
+    """
+    Sets the instrument sensitivity of an obspy Response to the overall
+    sensitivity at frequency (Hz)
+
+    Equivalent to response.recalculate_overall_sensitivity(frequency)
+    """
+    sensitivity = response.instrument_sensitivity
+    sensitivity.value = float(overall_sensitivities([response], frequency)[0])
+    sensitivity.frequency = float(frequency)
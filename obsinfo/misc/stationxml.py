@@ -0,0 +1,265 @@
+"""
+StationXML writer working directly with lxml
+
+Writes the same StationXML as obspy's writer (Inventory.write(...,
+"STATIONXML")), for the obspy Inventories made by obsinfo.  The network,
+station and channel elements are made with obspy's element helpers, but the
+responses, which are most of the file, are written here: the Response element
+of each (shared) obspy Response is made once and copied into every channel
+that uses it.
+
+Responses with parts that obsinfo never makes (instrument polynomials,
+response lists, polynomial stages, custom "extra" tags) are written by obspy.
+
+The element helpers are private functions of obspy.io.stationxml.core
+(_write_network(), _write_response() and _write_extra()), checked with obspy
+1.5.  If the installed obspy does not have them, supported() is False and
+writing raises a RuntimeError (use obspy's writer instead).
+"""
+# Standard library modules
+import copy
+
+# Non-standard modules
+from lxml import etree
+import obspy
+import obspy.core.inventory.response as obspy_response
+import obspy.io.stationxml.core as obspy_stationxml
+
+# obspy.io.stationxml.core names this writer needs
+_OBSPY_HELPERS = ("SCHEMA_VERSION", "_write_network", "_write_response",
+                  "_write_extra")
+
+
+def supported():
+    """ True if the installed obspy has the helpers this writer uses """
+    return all(hasattr(obspy_stationxml, name) for name in _OBSPY_HELPERS)
+
+def write_stationxml(inv, file):
+    """
+    Writes an obspy Inventory as StationXML
+
+    file: file name or binary file object
+    """
+    inventory_element(inv).getroottree().write(
+        file, pretty_print=True, xml_declaration=True, encoding="UTF-8"
+    )
+
+
+def inventory_element(inv):
+    """ Returns the StationXML root element of an obspy Inventory """
+    if not supported():
+        raise RuntimeError(
+            "The lxml StationXML writer does not support obspy {}: it needs "
+            "{} from obspy.io.stationxml.core".format(
+                obspy.__version__, ", ".join(_OBSPY_HELPERS))
+        )
+    root = etree.Element(
+        "FDSNStationXML",
+        attrib={"schemaVersion": obspy_stationxml.SCHEMA_VERSION},
+        nsmap={None: "http://www.fdsn.org/xml/station/1"},
+    )
+    etree.SubElement(root, "Source").text = inv.source
+    if inv.sender:
+        etree.SubElement(root, "Sender").text = inv.sender
+    etree.SubElement(root, "Module").text = inv.module
+    etree.SubElement(root, "ModuleURI").text = inv.module_uri
+    etree.SubElement(root, "Created").text = str(inv.created)
+    # Response elements already made: {id(Response): (Response, element)}
+    # (the Response is kept so that its id cannot be reused)
+    elements = dict()
+    for net in inv.networks:
+        obspy_stationxml._write_network(root, net, "channel")
+        net_element = root[-1]
+        for sta, sta_element in zip(net.stations, net_element.iterfind("Station")):
+            for cha, cha_element in zip(sta.channels,
+                                        sta_element.iterfind("Channel")):
+                if cha.response is not None:
+                    cha_element.append(response_element(cha.response,
+                                                        elements))
+    obspy_stationxml._write_extra(root, inv)
+    return root
+
+
+def response_element(response, elements=None):
+    """
+    Returns a new StationXML Response element for an obspy Response
+
+    elements: dict in which to keep the elements made, so that each Response
+              is only converted once (see write_stationxml())
+    """
+    if elements is None:
+        return _make_response(response)
+    entry = elements.get(id(response), None)
+    if entry is None:
+        entry = (response, _make_response(response))
+        elements[id(response)] = entry
+    return copy.deepcopy(entry[1])
+
+
+def _native(response):
+    """ True if the Response only has parts written by _make_response() """
+    if response.instrument_polynomial is not None or _extra(response):
+        return False
+    return all(
+        type(stage) is obspy_response.ResponseStage
+        or isinstance(stage, (obspy_response.PolesZerosResponseStage,
+                              obspy_response.CoefficientsTypeResponseStage,
+                              obspy_response.FIRResponseStage))
+        and not _extra(stage)
+        for stage in response.response_stages
+    )
+
+
+def _extra(obj):
+    return bool(getattr(obj, "extra", None))
+
+
+def _make_response(response):
+    if not _native(response):
+        parent = etree.Element("Channel")
+        obspy_stationxml._write_response(parent, response)
+        return parent[0]
+    attrib = {}
+    if response.resource_id is not None:
+        attrib["resourceId"] = response.resource_id
+    element = etree.Element("Response", attrib)
+    sensitivity = response.instrument_sensitivity
+    if sensitivity is not None and any(sensitivity.__dict__.values()):
+        _write_sensitivity(element, sensitivity)
+    for stage in response.response_stages:
+        _write_stage(element, stage)
+    return element
+
+
+def _sub(parent, tag, value):
+    """ Adds a tag if value is not None """
+    if value is not None:
+        etree.SubElement(parent, tag).text = str(value)
+
+
+def _write_float(parent, tag, value, number=None, unit=True):
+    """
+    Adds a tag for an (obspy) float with uncertainties and unit
+
+    number: name of the attribute giving value.number
+    """
+    if value is None:
+        return
+    attrib = dict(
+        datum=value.__dict__.get("datum"),
+        unit=getattr(value, "unit", None) if unit else None,
+        minusError=value.lower_uncertainty,
+        plusError=value.upper_uncertainty,
+        measurementMethod=value.measurement_method,
+    )
+    attrib = {k: str(v) for k, v in attrib.items() if v is not None}
+    if number and value.number is not None:
+        attrib[number] = str(value.number)
+    etree.SubElement(parent, tag, attrib).text = str(value)
+
+
+def _write_units(parent, obj):
+    for tag, name, description in (
+        ("InputUnits", obj.input_units, obj.input_units_description),
+        ("OutputUnits", obj.output_units, obj.output_units_description),
+    ):
+        units = etree.SubElement(parent, tag)
+        etree.SubElement(units, "Name").text = str(name)
+        _sub(units, "Description", description)
+
+
+def _write_sensitivity(parent, sensitivity):
+    element = etree.SubElement(parent, "InstrumentSensitivity")
+    etree.SubElement(element, "Value").text = str(sensitivity.value)
+    etree.SubElement(element, "Frequency").text = str(sensitivity.frequency)
+    _write_units(element, sensitivity)
+    frequency_range = [sensitivity.frequency_range_start,
+                       sensitivity.frequency_range_end,
+                       sensitivity.frequency_range_db_variation]
+    if all(x is not None for x in frequency_range):
+        for tag, value in zip(("FrequencyStart", "FrequencyEnd",
+                               "FrequencyDBVariation"), frequency_range):
+            etree.SubElement(element, tag).text = str(value)
+    elif any(x is not None for x in frequency_range):
+        raise ValueError("Frequency range group of instrument sensitivity "
+                         "specification invalid")
+
+
+def _write_stage(parent, stage):
+    attrib = {"number": str(stage.stage_sequence_number)}
+    if stage.resource_id is not None:
+        attrib["resourceId"] = stage.resource_id
+    element = etree.SubElement(parent, "Stage", attrib)
+    if type(stage) is not obspy_response.ResponseStage:
+        if isinstance(stage, obspy_response.PolesZerosResponseStage):
+            tag = "PolesZeros"
+        elif isinstance(stage, obspy_response.CoefficientsTypeResponseStage):
+            tag = "Coefficients"
+        else:
+            tag = "FIR"
+        attrib = {}
+        if stage.name is not None:
+            attrib["name"] = str(stage.name)
+        if stage.resource_id2 is not None:
+            attrib["resourceId"] = stage.resource_id2
+        filter_element = etree.SubElement(element, tag, attrib)
+        _sub(filter_element, "Description", stage.description)
+        _write_units(filter_element, stage)
+        if tag == "PolesZeros":
+            _write_poles_zeros(filter_element, stage)
+        elif tag == "Coefficients":
+            _write_coefficients(filter_element, stage)
+        else:
+            _write_FIR(filter_element, stage)
+    if stage.decimation_input_sample_rate is not None:
+        decimation = etree.SubElement(element, "Decimation")
+        _write_float(decimation, "InputSampleRate",
+                     stage.decimation_input_sample_rate)
+        _sub(decimation, "Factor", stage.decimation_factor)
+        _sub(decimation, "Offset", stage.decimation_offset)
+        _write_float(decimation, "Delay", stage.decimation_delay)
+        _write_float(decimation, "Correction", stage.decimation_correction)
+    gain = etree.SubElement(element, "StageGain")
+    _sub(gain, "Value", stage.stage_gain)
+    _sub(gain, "Frequency", stage.stage_gain_frequency)
+
+
+def _write_poles_zeros(parent, stage):
+    _sub(parent, "PzTransferFunctionType", stage.pz_transfer_function_type)
+    _sub(parent, "NormalizationFactor", stage.normalization_factor)
+    _write_float(parent, "NormalizationFrequency", stage.normalization_frequency)
+    roots = list(stage.zeros) + list(stage.poles)
+    numbered = all(getattr(x, "number", None) is not None for x in roots)
+    for tag, values in (("Zero", stage.zeros), ("Pole", stage.poles)):
+        for i, value in enumerate(values):
+            element = etree.SubElement(
+                parent, tag, {"number": str(value.number if numbered else i)}
+            )
+            real, imaginary = {}, {}
+            for name, key in (("minusError", "lower_uncertainty"),
+                              ("plusError", "upper_uncertainty")):
+                uncertainty = getattr(value, key)
+                if uncertainty is not None:
+                    real[name] = str(uncertainty.real)
+                    imaginary[name] = str(uncertainty.imag)
+            if value.measurement_method_real is not None:
+                real["measurement_method"] = value.measurement_method_real
+            if value.measurement_method_imag is not None:
+                imaginary["measurement_method"] = value.measurement_method_imag
+            etree.SubElement(element, "Real", real).text = str(value.real)
+            etree.SubElement(element, "Imaginary", imaginary).text = \
+                str(value.imag)
+
+
+def _write_coefficients(parent, stage):
+    _sub(parent, "CfTransferFunctionType", stage.cf_transfer_function_type)
+    for tag, values in (("Numerator", stage.numerator),
+                        ("Denominator", stage.denominator)):
+        for value in values:
+            _write_float(parent, tag, value, number="number", unit=False)
+
+
+def _write_FIR(parent, stage):
+    _sub(parent, "Symmetry", stage.symmetry)
+    for value in stage.coefficients:
+        _write_float(parent, "NumeratorCoefficient", value, number="i")
@@ -10,18 +10,32 @@ I need to modify the code so that it treats a $ref as a placeholder for the
 associated object
 """
 # Standard library modules
+import io
+import os
 import os.path
+import sys
+from concurrent.futures import ProcessPoolExecutor
 
 # Non-standard modules
+from lxml import etree
 import obspy.core.inventory as obspy_inventory
 import yaml
 # import obspy.core.inventory.util as obspy_util
 # from obspy.core.utcdatetime import UTCDateTime
 
-from ..misc.info_files import load_information_file
+from ..misc.info_files import (load_information_file, set_revalidate,
+                               resolve_path, split_reference)
+from ..misc.disk_cache import element_hash, file_hash
+from ..misc.incremental import build_manifest
+from ..misc.references import reference_tree
 from ..misc import FDSN as oi_FDSN
+from ..misc import obspy as oi_obspy
+from ..misc import stationxml as oi_stationxml
+from ..instrumentation import instrumentation_registry
+from ..instrument_components import instrument_components_registry
 from .station import station as oi_station
 from .util import create_comments
+from ..version import __version__
 
 ###############################################################################
 
@@ -38,12 +52,25 @@ class network:
         """ Reads from a network information file
 
         should also be able to specify whether or not it has read its sub_file
+
+        All files referenced from the network file are read once, up front,
+        by a reference_tree (self.references)
+
+        self.station_hashes ({station code: hash}) and self.network_hash
+        (hash of everything but the stations) identify the contents of the
+        network file, for incremental builds
         """
+        self.references = reference_tree(filename, referring_file)
         root, path = load_information_file(filename, referring_file)
         self.basepath = path
         self.revision = root["revision"].copy()
         self.format_version = root["format_version"]
         net = root["network"]
+        self.station_hashes = {code: element_hash(station)
+                               for code, station in net["stations"].items()}
+        self.network_hash = element_hash(dict(
+            root, network={k: v for k, v in net.items() if k != "stations"}
+        ))
         self.facility_ref_name = net["facility"]["reference_name"]
         self.facility_full_name = net["facility"].get("full_name", None)
         self.campaign = net["campaign_reference_name"]
@@ -54,6 +81,12 @@ class network:
                 "No instrumentation file specfied, cannot create StationXML"
             )
         self.stations = dict()
+        # Instrumentations and components are loaded once and shared by all
+        # stations
+        self.instrumentations = instrumentation_registry()
+        self.components = instrument_components_registry()
+        # obspy Responses built for the stations: {fingerprint: Response}
+        self.responses = dict()
         if debug:
             print("in network:__init__()")
         for code, station in root["network"]["stations"].items():
@@ -64,7 +97,11 @@ class network:
             if self.instrumentation_file["$ref"]:
                 # Fill the instrument
                 self.stations[code].fill_instrument(
-                    self.instrumentation_file, referring_file=self.basepath
+                    self.instrumentation_file, referring_file=self.basepath,
+                    instrumentation=self.instrumentations.get(
+                        self.instrumentation_file["$ref"], self.basepath
+                    ),
+                    components=self.components,
                 )
 
             if debug:
@@ -79,6 +116,87 @@ class network:
             len(self.stations),
         )
 
+    def response_chains(self):
+        """ Returns {response chain: number of channels}
+
+        A response chain is the tuple of the response_key()s of a channel's
+        sensor, preamplifier (if any) and datalogger
+        """
+        chains = dict()
+        for station in self.stations.values():
+            for instrument in station.instruments:
+                for channel in instrument.das_components.values():
+                    chain = tuple(
+                        channel[block_type].response_key()
+                        for block_type in ["sensor", "preamplifier", "datalogger"]
+                        if block_type in channel
+                    )
+                    chains[chain] = chains.get(chain, 0) + 1
+        return chains
+
+    def print_response_chains(self):
+        """ Prints the number of channels and of unique response chains """
+        chains = self.response_chains()
+        print("{:d} channels, {:d} unique response chains".format(
+            sum(chains.values()), len(chains)))
+        for chain, n_channels in sorted(chains.items(), key=lambda x: -x[1]):
+            print("    {:3d} x {}".format(
+                n_channels, " -> ".join(key[2] for key in chain)))
+
+    def station_files(self, station_name):
+        """
+        Returns the information files (absolute paths) that a station is made
+        from, apart from the network file: the instrumentation and components
+        files, and the response and filter files of its channels
+        """
+        files = set()
+        if self.instrumentation_file["$ref"]:
+            files.add(os.path.abspath(resolve_path(
+                split_reference(self.instrumentation_file["$ref"])[0],
+                self.basepath)))
+        response_files = []
+        for instrument in self.stations[station_name].instruments:
+            if not hasattr(instrument, "das_components"):
+                continue
+            files.add(os.path.abspath(os.path.join(
+                instrument.basepath, instrument.components_file)))
+            for channel in instrument.das_components.values():
+                for block_type in ["sensor", "preamplifier", "datalogger"]:
+                    if block_type not in channel:
+                        continue
+                    component = channel[block_type]
+                    for ref in component.response_key()[3]:
+                        response_files.append(os.path.abspath(os.path.join(
+                            component.basepath, split_reference(ref)[0])))
+        # Response files and the filter files they refer to
+        while response_files:
+            path = response_files.pop()
+            if path not in files:
+                files.add(path)
+                response_files.extend(self.references.files.get(path, []))
+        return sorted(files)
+
+    def build_inputs(self, station_name):
+        """
+        Returns what a station's StationXML depends on: hashes of its station
+        element, of the rest of the network file and of each file in
+        station_files(), plus the obsinfo version and sensitivity engine
+        """
+        return dict(
+            station=self.station_hashes[station_name],
+            network=self.network_hash,
+            files={f: file_hash(f) for f in self.station_files(station_name)},
+            obsinfo_version=__version__,
+            sensitivity=oi_obspy.sensitivity_engine,
+        )
+
+    def stationXML_filename(self, station_name=None):
+        """ Returns the name of a station's StationXML file (or of the network
+        file if station_name is None) """
+        if station_name is None:
+            return "{}.STATION.xml".format(self.network_info.code)
+        return "{}.{}.STATION.xml".format(self.network_info.code, station_name)
+
     def __make_obspy_inventory(self, stations=None, source=None, debug=False):
         """
         Make an obspy inventory object with a subset of stations
@@ -103,7 +221,9 @@ class network:
         """Make an obspy network object with a subset of stations"""
         obspy_stations = []
         for station in stations:
-            obspy_stations.append(station.make_obspy_station())
+            obspy_stations.append(
+                station.make_obspy_station(responses=self.responses)
+            )
 
         temp = self.network_info.comments
         comments = None
@@ -120,7 +240,13 @@ class network:
         return my_net
 
     def write_stationXML(self, station_name, destination_folder=None,
-                         debug=False):
+                         serializer="obspy", debug=False):
+        """
+        Writes one station's StationXML file
+
+        serializer: "obspy" (obspy's writer) or "lxml" (misc.stationxml)
+        Returns the path of the written file
+        """
         station = self.stations[station_name]
         if debug:
             print("Creating obsPy inventory object")
@@ -129,16 +255,246 @@ class network:
             print(yaml.dump(my_inv))
         if not destination_folder:
             destination_folder = "."
-        fname = os.path.join(
-            destination_folder,
-            "{}.{}.STATION.xml".format(self.network_info.code, station_name),
-        )
+        fname = os.path.join(destination_folder,
+                             self.stationXML_filename(station_name))
         print("Writing to", fname)
-        my_inv.write(fname, "STATIONXML")
+        _write_inventory(my_inv, fname, serializer)
+        return fname
+
+    def write_network_stationXML(self, station_names=None,
+                                 destination_folder=None, filename=None,
+                                 streaming=False, serializer="obspy",
+                                 incremental=False, debug=False):
+        """
+        Writes all stations (or station_names) to one StationXML file
+
+        filename: default "{network code}.STATION.xml"
+        streaming: build and write one station at a time, so that only one
+                   station's obspy objects are in memory (the file is the
+                   same)
+        serializer: "obspy" (obspy's writer) or "lxml" (misc.stationxml)
+        incremental: only write the file if the inputs of its stations
+                     changed since it was last written (see build_manifest)
+        Returns the path of the file
+        """
+        if station_names is None:
+            station_names = list(self.stations)
+        stations = [self.stations[name] for name in station_names]
+        if not destination_folder:
+            destination_folder = "."
+        if not filename:
+            filename = self.stationXML_filename()
+        fname = os.path.join(destination_folder, filename)
+        if incremental:
+            manifest = build_manifest(destination_folder)
+            inputs = {name: self.build_inputs(name) for name in station_names}
+            if manifest.is_current(filename, inputs):
+                print("Skipped", fname, "(up to date)")
+                return fname
+        if streaming:
+            print("Streaming to", fname)
+            self.__write_stationXML_stream(stations, fname, serializer)
+        else:
+            if debug:
+                print("Creating obsPy inventory object")
+            my_inv = self.__make_obspy_inventory(stations)
+            print("Writing to", fname)
+            _write_inventory(my_inv, fname, serializer)
+        if incremental:
+            manifest.record(filename, inputs)
+            manifest.save()
+        return fname
+
+    def __write_stationXML_stream(self, stations, fname, serializer="obspy"):
+        """
+        Writes a network StationXML file one station at a time
+
+        The file header and network element come from an inventory without
+        stations, then each station is made, converted to StationXML, written
+        (with lxml's incremental writer) and discarded, along with the
+        responses built for it.  The file is written under a temporary name
+        and only replaces fname once complete.
+        """
+        skeleton = self.__make_obspy_inventory([])
+        root = _inventory_element(skeleton, serializer)
+        tmp_name = "{}.{:d}.tmp".format(fname, os.getpid())
+        try:
+            with open(tmp_name, "wb") as f:
+                with etree.xmlfile(f, encoding="UTF-8") as xf:
+                    xf.write_declaration()
+                    with xf.element(root.tag, root.attrib, nsmap=root.nsmap):
+                        for child in list(root):
+                            if etree.QName(child).localname != "Network":
+                                _write_element(xf, child, 1)
+                                continue
+                            xf.write("\n  ")
+                            with xf.element(child.tag, child.attrib):
+                                for element in list(child):
+                                    _write_element(xf, element, 2)
+                                for station in stations:
+                                    self.__write_station_element(
+                                        xf, station, serializer,
+                                        skeleton.source)
+                                xf.write("\n  ")
+                        xf.write("\n")
+                f.write(b"\n")
+            os.replace(tmp_name, fname)
+        except BaseException:
+            if os.path.exists(tmp_name):
+                os.remove(tmp_name)
+            raise
+
+    def __write_station_element(self, xf, station, serializer, source):
+        """ Makes one station and writes its StationXML element """
+        my_inv = obspy_inventory.inventory.Inventory(
+            [obspy_inventory.network.Network(
+                self.network_info.code,
+                [station.make_obspy_station(responses=dict())]
+            )],
+            source,
+        )
+        net_element = _inventory_element(my_inv, serializer).find(
+            "{*}Network")
+        for element in net_element.findall("{*}Station"):
+            _write_element(xf, element, 2)
+
+    def write_station_XMLs(self, destination_folder=None, n_jobs=1,
+                           station_names=None, serializer="obspy",
+                           incremental=False):
+        """
+        Writes one StationXML file per station, using a pool of n_jobs
+        processes (the network is sent once to each process)
+
+        n_jobs: number of processes (None: number of CPUs, 1 = no pool)
+        station_names: stations to write (default: all)
+        serializer: "obspy" (obspy's writer) or "lxml" (misc.stationxml)
+        incremental: only write the stations whose inputs changed since their
+                     file was last written (see build_manifest)
+        A station that fails does not stop the others.
+        Returns {station name: error message} for the stations that failed
+        """
+        if station_names is None:
+            station_names = list(self.stations)
+        if incremental:
+            manifest = build_manifest(destination_folder)
+            inputs = {name: {name: self.build_inputs(name)}
+                      for name in station_names}
+            skipped = [name for name in station_names if manifest.is_current(
+                self.stationXML_filename(name), inputs[name])]
+            if skipped:
+                print("Skipped {:d} up-to-date station(s): {}".format(
+                    len(skipped), ", ".join(skipped)))
+            station_names = [s for s in station_names if s not in skipped]
+            errors = self.write_station_XMLs(destination_folder, n_jobs,
+                                             station_names, serializer)
+            for name in station_names:
+                if name not in errors:
+                    manifest.record(self.stationXML_filename(name),
+                                    inputs[name])
+            manifest.save()
+            return errors
+        if n_jobs is None:
+            n_jobs = os.cpu_count() or 1
+        n_jobs = min(n_jobs, len(station_names))
+        if n_jobs <= 1:
+            errors = [
+                _write_stationXML_job(name, destination_folder, serializer, self)
+                for name in station_names
+            ]
+        else:
+            with ProcessPoolExecutor(
+                max_workers=n_jobs,
+                initializer=_init_stationXML_worker,
+                initargs=(self, oi_obspy.sensitivity_engine),
+            ) as executor:
+                errors = list(executor.map(
+                    _write_stationXML_job, station_names,
+                    [destination_folder] * len(station_names),
+                    [serializer] * len(station_names),
+                ))
+        return {name: error for name, error in zip(station_names, errors)
+                if error}
+
+
+# Namespace of StationXML elements
+_STATIONXML_NS = "{http://www.fdsn.org/xml/station/1}"
 
-    def write_station_XMLs(self, destination_folder=None):
-        for station_name in self.stations:
-            self.write_station(station_name, destination_folder)
+
+def _write_inventory(my_inv, file, serializer="obspy"):
+    """
+    Writes an obspy inventory as StationXML
+
+    file: file name or binary file object
+    serializer: "obspy" (obspy's writer) or "lxml" (misc.stationxml)
+    """
+    if serializer == "lxml":
+        oi_stationxml.write_stationxml(my_inv, file)
+    elif serializer == "obspy":
+        my_inv.write(file, "STATIONXML")
+    else:
+        raise ValueError(f'Unknown StationXML serializer "{serializer}"')
+
+
+def _stationXML_bytes(my_inv, serializer="obspy"):
+    """ Returns an obspy inventory as StationXML """
+    buffer = io.BytesIO()
+    _write_inventory(my_inv, buffer, serializer)
+    return buffer.getvalue()
+
+
+def _inventory_element(my_inv, serializer="obspy"):
+    """ Returns the StationXML root element of an obspy inventory """
+    if serializer == "lxml":
+        return oi_stationxml.inventory_element(my_inv)
+    return etree.fromstring(_stationXML_bytes(my_inv, serializer))
+
+
+def _write_element(xf, element, level):
+    """
+    Writes a StationXML element with an etree.xmlfile, indented as in a
+    pretty-printed file at level (1: children of the root element)
+
+    The element is taken out of its document, and its namespace is left
+    out: it is the default namespace declared by the root element
+    """
+    if element.getparent() is not None:
+        element.getparent().remove(element)
+    for e in element.iter(tag=etree.Element):
+        if e.tag.startswith(_STATIONXML_NS):
+            e.tag = e.tag[len(_STATIONXML_NS):]
+    etree.cleanup_namespaces(element)
+    etree.indent(element, level=level)
+    element.tail = None
+    xf.write("\n" + "  " * level)
+    xf.write(element)
+
+
+# Network written by a StationXML worker process (see write_station_XMLs())
+_worker_network = None
+
+
+def _init_stationXML_worker(net, sensitivity_engine):
+    """ Receives the network once in each StationXML worker process """
+    global _worker_network
+    _worker_network = net
+    oi_obspy.set_sensitivity_engine(sensitivity_engine)
+
+
+def _write_stationXML_job(station_name, destination_folder, serializer="obspy",
+                          net=None):
+    """
+    Writes one station's StationXML file
+
+    net: network (default: the worker process's network)
+    Returns None, or an error message if the station failed
+    """
+    if net is None:
+        net = _worker_network
+    try:
+        net.write_stationXML(station_name, destination_folder, serializer)
+    except Exception as e:
+        return "{}: {}".format(type(e).__name__, e)
+    return None
 
 
 def _make_stationXML_script(argv=None):
@@ -153,10 +509,56 @@ def _make_stationXML_script(argv=None):
     parser.add_argument(
         "-d", "--dest_path", help="Destination folder for StationXML files"
     )
+    parser.add_argument(
+        "--revalidate", action="store_true",
+        help="validate all information files, even those already validated"
+    )
+    parser.add_argument(
+        "--sensitivity", choices=["numpy", "obspy"], default="numpy",
+        help="overall sensitivity calculator (obspy: evalresp)"
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=1,
+        help="number of stations to build and write in parallel "
+             "(0: number of CPUs)"
+    )
+    parser.add_argument(
+        "--network_output", action="store_true",
+        help="write all stations to one network StationXML file "
+             "(NET.STATION.xml) instead of one file per station"
+    )
+    parser.add_argument(
+        "--streaming", action="store_true",
+        help="with --network_output, build and write one station at a time "
+             "to limit memory use"
+    )
+    parser.add_argument(
+        "--serializer", choices=["obspy", "lxml"], default="obspy",
+        help="StationXML writer (lxml: obsinfo's own, faster)"
+    )
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="only rewrite the StationXML files whose inputs changed since "
+             "the last --incremental run (recorded in "
+             + build_manifest.filename + " in the destination folder)"
+    )
+    parser.add_argument(
+        "-s", "--stations", nargs="+", metavar="STATION",
+        help="only write these stations"
+    )
     # parser.add_argument( '-v', '--verbose',action="store_true",
     #            help='increase output verbosiy')
 
     args = parser.parse_args(argv)
+    if args.serializer == "lxml" and not oi_stationxml.supported():
+        parser.error("--serializer lxml is not supported by the installed "
+                     "obspy, use --serializer obspy")
+    if args.streaming and not args.network_output:
+        parser.error("--streaming requires --network_output")
+    if args.jobs != 1 and args.network_output:
+        parser.error("-j/--jobs cannot be used with --network_output")
+    set_revalidate(args.revalidate)
+    oi_obspy.set_sensitivity_engine(args.sensitivity)
 
     if args.dest_path:
         if not os.path.exists(args.dest_path):
@@ -166,5 +568,22 @@ def _make_stationXML_script(argv=None):
     net = network(args.network_file)
     # print(net)
 
-    for station in net.stations:
-        net.write_stationXML(station, args.dest_path)
+    if args.stations:
+        unknown = [s for s in args.stations if s not in net.stations]
+        if unknown:
+            print("Unknown station(s): {}".format(", ".join(unknown)))
+            sys.exit(1)
+    if args.network_output:
+        net.write_network_stationXML(args.stations, args.dest_path,
+                                     streaming=args.streaming,
+                                     serializer=args.serializer,
+                                     incremental=args.incremental)
+        return
+    errors = net.write_station_XMLs(args.dest_path, n_jobs=args.jobs or None,
+                                    station_names=args.stations,
+                                    serializer=args.serializer,
+                                    incremental=args.incremental)
+    for station, error in errors.items():
+        print(f"FAILED station {station}: {error}")
+    if errors:
+        sys.exit(1)
@@ -51,9 +51,17 @@ class station:
                 )
         return txt
 
-    def fill_instrument(self, instrument_file, referring_file=None):
-        """ Fills in instrument information """
-        self.partial_fill_instruments(instrument_file, referring_file)
+    def fill_instrument(self, instrument_file, referring_file=None,
+                        instrumentation=None, components=None):
+        """ Fills in instrument information
+
+        instrumentation: already loaded instrumentation object for
+                         instrument_file (shared between stations)
+        components: instrument_components_registry shared between stations
+        """
+        self.partial_fill_instruments(instrument_file, referring_file,
+                                      instrumentation=instrumentation,
+                                      components=components)
         if self.sensors:
             print("Adding custom sensors")
             self.instruments.modify_sensors(self.sensors, referring_file)
@@ -61,22 +69,28 @@ class station:
             inst.fill_responses()
 
     def partial_fill_instruments(self, instrument_file,
-                                 referring_file=None, debug=True):
+                                 referring_file=None, debug=True,
+                                 instrumentation=None, components=None):
         """ Converts network file instrument objects to Instrument class.
             ??? Does not fill in component responses ??? """
         instruments = []
         for inst_dict in self.instruments:
             inst = oi_instrument(instrument_file["$ref"], inst_dict,
-                                 referring_file=referring_file)
-            inst.load_components(inst.components_file, inst.basepath)
+                                 referring_file=referring_file,
+                                 instrumentation=instrumentation)
+            inst.load_components(inst.components_file, inst.basepath,
+                                 registry=components)
             self.operator = inst.facility  # à verifier??
             # instruments[inst_dict["reference_code"]]=inst
             instruments.append(inst)
         self.instruments = instruments
 
-    def make_obspy_station(self, debug=False):
+    def make_obspy_station(self, debug=False, responses=None):
         """
         Create an obspy station object from a fully informed station
+
+        responses: dict in which to share obspy Responses between channels
+                   (and stations), see misc.obspy.response()
         """
         # CREATE CHANNELS
 
@@ -89,7 +103,8 @@ class station:
                 if debug:
                     print(key)
                     print(yaml.dump(chan))
-                response = oi_obspy.response(chan["response"])
+                response = oi_obspy.response(chan["response"],
+                                             cache=responses)
                 # loc_code=key.split(':')[1]
                 loc_code = chan["location_code"]
                 try:
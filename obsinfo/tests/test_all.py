@@ -7,14 +7,40 @@ from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
 from future.builtins import *  # NOQA @UnusedWildImport
 
+import io
 import os
+import copy
+import contextlib
 import glob
+import shutil
+import tempfile
 import unittest
 import inspect
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
 import xml.etree.ElementTree as ET
+import yaml
 from CompareXMLTree import XmlTree
 from obsinfo.network.network import _make_stationXML_script
-from obsinfo.misc.info_files import validate
+from obsinfo.network import network
+from obsinfo.misc import obspy as oi_obspy
+from obsinfo.misc import stationxml as oi_stationxml
+from obspy import read_inventory
+from obspy.core.inventory import Inventory, Network
+from obspy.core.inventory.response import FIRResponseStage
+from obsinfo.misc.sensitivity import overall_sensitivities
+from obsinfo.misc import misc as oi_misc
+from obsinfo.misc.misc import calc_norm_factor
+from obsinfo.instrument_components import instrument_components
+from obsinfo.misc.references import reference_tree
+from obsinfo.misc.incremental import incremental_validation, build_manifest
+from obsinfo.misc.disk_cache import (validation_ledger, parsed_file_cache,
+                                     file_hash)
+from obsinfo.misc.info_files import (validate, load_information_file,
+                                     information_file_cache, get_file_cache,
+                                     get_schema_validator, validate_file,
+                                     read_json_yaml, find_information_files,
+                                     validate_files, get_validation_ledger)
 
 
 class TestADDONSMethods(unittest.TestCase):
@@ -28,6 +54,14 @@ class TestADDONSMethods(unittest.TestCase):
         self.infofiles_path = os.path.join(os.path.split(self.path)[0],
                                            '_examples',
                                            'Information_Files')
+        # Keep the on-disk caches (validation ledger, parse results) out of
+        # the user's cache directory, and independent of earlier runs
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        patcher = mock.patch.dict(os.environ, {"OBSINFO_CACHE_DIR": cache_dir})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(get_validation_ledger().save)
 
     def test_makeSTATIONXML(self):
         """
@@ -54,6 +88,21 @@ class TestADDONSMethods(unittest.TestCase):
                     excludes_attributes=excludes_attributes))
                 os.remove(stxml)
 
+    def test_shared_instrumentation(self):
+        """
+        Test that all stations share one instrumentation and one
+        instrument_components object
+        """
+        net = network(os.path.join(self.infofiles_path, "campaign",
+                                   "SPOBS.INSU-IPGP.network.yaml"))
+        self.assertEqual(len(net.instrumentations.instrumentations), 1)
+        self.assertEqual(len(net.components.components), 1)
+        instruments = [inst for sta in net.stations.values()
+                       for inst in sta.instruments]
+        self.assertEqual(len(instruments), 2)
+        self.assertIsNot(instruments[0].das_components,
+                         instruments[1].das_components)
+
     def test_validate_networks(self):
         """
         Test validate network files
@@ -104,6 +153,633 @@ class TestADDONSMethods(unittest.TestCase):
                                             "*.filter.yaml")):
             self.assertTrue(validate(fname,quiet=True))
 
+    def test_schema_validators(self):
+        """
+        Test that each schema is compiled only once
+        """
+        for type in ["network", "response", "filter"]:
+            self.assertIs(get_schema_validator(type),
+                          get_schema_validator(type))
+
+    def test_validation_report(self):
+        """
+        Test the structured validation report
+        """
+        fname = os.path.join(self.infofiles_path, "campaign",
+                             "SPOBS.INSU-IPGP.network.yaml")
+        report = validate_file(fname)
+        self.assertTrue(report.valid)
+        self.assertEqual(report.type, "network")
+        instance = load_information_file(fname)[0]
+        del instance["network"]["facility"]
+        report = validate_file(fname, instance=instance)
+        self.assertFalse(report.valid)
+        self.assertEqual(report.errors[0][0], ["network"])
+        self.assertIn("'facility' is a required property",
+                      report.error_lines()[0])
+
+    def test_yaml_loaders(self):
+        """
+        Test that the default (C, if available) YAML loader gives the same
+        results as the pure-Python one
+        """
+        for fname in glob.glob(os.path.join(self.infofiles_path, "**",
+                                            "*.yaml"), recursive=True):
+            self.assertEqual(read_json_yaml(fname),
+                             read_json_yaml(fname, loader=yaml.SafeLoader))
+
+    def test_validate_files(self):
+        """
+        Test batch validation of a directory, in parallel
+        """
+        fnames = find_information_files([self.infofiles_path])
+        self.assertIn(os.path.join(self.infofiles_path, "campaign",
+                                   "SPOBS.INSU-IPGP.network.yaml"), fnames)
+        self.assertEqual(
+            len(find_information_files([os.path.join(
+                self.infofiles_path, "campaign", "*.network.yaml")])), 3)
+        reports = validate_files(fnames[:6], n_jobs=2)
+        self.assertEqual([r.filename for r in reports], fnames[:6])
+        self.assertTrue(all(r.valid for r in reports))
+
+    def test_validate_unknown_types(self):
+        """
+        Test that files of unknown type are not found by globs, and fail
+        validation without stopping the others
+        """
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        stray = os.path.join(tmpdir, "notes.yaml")
+        with open(stray, "w") as f:
+            f.write("a: 1\n")
+        self.assertEqual(
+            find_information_files([os.path.join(tmpdir, "*.yaml")]), [])
+        fname = os.path.join(self.infofiles_path, "campaign",
+                             "SPOBS.INSU-IPGP.network.yaml")
+        reports = validate_files([stray, fname], n_jobs=2)
+        self.assertFalse(reports[0].valid)
+        self.assertIsNone(reports[0].type)
+        self.assertTrue(reports[1].valid)
+
+    def test_validate_missing_files(self):
+        """
+        Test that missing files fail validation without stopping the others
+        """
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        missing = os.path.join(tmpdir, "missing.network.yaml")
+        fname = os.path.join(self.infofiles_path, "campaign",
+                             "SPOBS.INSU-IPGP.network.yaml")
+        for n_jobs in [1, 2]:
+            reports = validate_files([fname, missing], n_jobs=n_jobs)
+            self.assertTrue(reports[0].valid)
+            self.assertFalse(reports[1].valid)
+            self.assertIn("missing.network.yaml", reports[1].parse_error)
+        reports = incremental_validation(
+            os.path.join(tmpdir, "state.json")).run([fname, missing], n_jobs=1)
+        self.assertEqual([r.valid for r in reports], [True, False])
+
+    def test_incremental_validation(self):
+        """
+        Test that only changed files and the files referring to them are
+        re-checked
+        """
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        files_dir = os.path.join(tmpdir, "Information_Files")
+        shutil.copytree(self.infofiles_path, files_dir)
+        state_file = os.path.join(tmpdir, "state.json")
+        fnames = find_information_files([os.path.join(files_dir,
+                                                      "instrumentation")])
+        reports = incremental_validation(state_file).run(fnames, n_jobs=1)
+        self.assertEqual(len(reports), len(fnames))
+        n_failed = len([r for r in reports if not r.valid])
+        reports = incremental_validation(state_file).run(fnames, n_jobs=1)
+        self.assertEqual(len(reports), n_failed)
+        filter_file = os.path.join(files_dir, "instrumentation", "responses",
+                                   "_filters", "FIR",
+                                   "CirrusLogic_CS5322_FIR2.filter.yaml")
+        with open(filter_file, "a") as f:
+            f.write("\n")
+        checked = [r.filename for r in
+                   incremental_validation(state_file).run(fnames, n_jobs=1)]
+        self.assertIn(filter_file, checked)
+        self.assertIn(os.path.join(files_dir, "instrumentation",
+                                   "instrument_components.yaml"), checked)
+        self.assertNotIn(os.path.join(
+            files_dir, "instrumentation", "responses", "_filters", "FIR",
+            "CirrusLogic_CS5322_FIR3.filter.yaml"), checked)
+
+    def test_incremental_validation_options(self):
+        """
+        Test that incremental validation uses the forced type, and reports a
+        file that cannot be parsed only once
+        """
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        state_file = os.path.join(tmpdir, "state.json")
+        bad_file = os.path.join(tmpdir, "bad.filter.yaml")
+        with open(bad_file, "w") as f:
+            f.write("filter: [\n")
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            reports = incremental_validation(state_file).run([bad_file],
+                                                             n_jobs=1)
+            for report in reports:
+                report.print(quiet=True)
+        self.assertFalse(reports[0].valid)
+        self.assertEqual(output.getvalue().count("Error loading YAML file"), 1)
+        filter_file = os.path.join(self.infofiles_path, "instrumentation",
+                                   "responses", "_filters", "FIR",
+                                   "CirrusLogic_CS5322_FIR2.filter.yaml")
+        reports = incremental_validation(state_file).run(
+            [filter_file], n_jobs=1, type="network")
+        self.assertEqual(reports[0].type, "network")
+        self.assertFalse(reports[0].valid)
+
+    def test_validation_ledger(self):
+        """
+        Test the record of already-validated files
+        """
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        ledger_file = os.path.join(tmpdir, "validated_files.json")
+        fname = os.path.join(self.infofiles_path, "campaign",
+                             "SPOBS.INSU-IPGP.network.yaml")
+        ledger = validation_ledger(ledger_file)
+        self.assertFalse(ledger.is_validated(file_hash(fname), "network"))
+        ledger.add(file_hash(fname), "network")
+        self.assertFalse(os.path.isfile(ledger_file))
+        ledger.save()
+        ledger = validation_ledger(ledger_file)
+        self.assertTrue(ledger.is_validated(file_hash(fname), "network"))
+        self.assertFalse(ledger.is_validated(file_hash(fname), "response"))
+        ledger.revalidate = True
+        self.assertFalse(ledger.is_validated(file_hash(fname), "network"))
+
+    def test_parsed_file_cache(self):
+        """
+        Test the on-disk cache of parsed information files
+        """
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        fname = os.path.join(self.infofiles_path, "campaign",
+                             "SPOBS.INSU-IPGP.network.yaml")
+        cache = parsed_file_cache("test", tmpdir)
+        self.assertIsNone(cache.get(file_hash(fname)))
+        element = read_json_yaml(fname, loader=yaml.SafeLoader)
+        cache.put(file_hash(fname), element)
+        cache = parsed_file_cache("test", tmpdir)
+        self.assertEqual(cache.get(file_hash(fname)), element)
+        self.assertIsNone(cache.get(file_hash(fname), "JSON"))
+        self.assertIsNone(parsed_file_cache("other", tmpdir).get(
+            file_hash(fname)))
+        # Writing prunes other parser versions and the oldest files
+        cache = parsed_file_cache("new", tmpdir)
+        cache.put("a", element)
+        self.assertEqual(os.listdir(tmpdir), ["new"])
+        cache.put("b", element)
+        os.utime(os.path.join(cache.directory, "a.yaml.pickle"), (0, 0))
+        cache.max_size = os.path.getsize(
+            os.path.join(cache.directory, "b.yaml.pickle"))
+        cache.prune()
+        self.assertEqual(os.listdir(cache.directory), ["b.yaml.pickle"])
+        # A directory others can write to is not used
+        os.chmod(cache.directory, 0o777)
+        self.assertIsNone(parsed_file_cache("new", tmpdir).get("b"))
+
+    def test_reference_tree(self):
+        """
+        Test resolving the tree of files referenced by a network file
+        """
+        net_file = os.path.join(self.infofiles_path, "campaign",
+                                "SPOBS.INSU-IPGP.network.yaml")
+        get_file_cache().invalidate()
+        misses = get_file_cache().misses
+        tree = reference_tree(net_file, n_threads=4)
+        self.assertEqual(get_file_cache().misses - misses, len(tree.files))
+        serial_tree = reference_tree(net_file, n_threads=1)
+        self.assertEqual(tree.files, serial_tree.files)
+        self.assertEqual(list(tree.files)[1],
+                         os.path.join(self.infofiles_path, "instrumentation",
+                                      "instrumentation.yaml"))
+        self.assertGreater(len(tree.references), len(tree.files))
+        self.assertEqual(tree.cycles, [])
+
+    def test_reference_cycles(self):
+        """
+        Test detection of circular and missing references
+        """
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        for name, ref in [("a", "b.filter.yaml"), ("b", "a.filter.yaml#filter"),
+                          ("c", "absent.filter.yaml")]:
+            with open(os.path.join(tmpdir, name + ".filter.yaml"), "w") as f:
+                f.write('filter: {"$ref": "' + ref + '"}\n')
+        tree = reference_tree(os.path.join(tmpdir, "a.filter.yaml"))
+        self.assertEqual(len(tree.files), 2)
+        self.assertEqual(len(tree.cycles), 1)
+        tree = reference_tree(os.path.join(tmpdir, "c.filter.yaml"))
+        self.assertEqual(len(tree.missing), 1)
+
+    def test_file_cache(self):
+        """
+        Test that information files are read once and re-read when modified
+        """
+        src = os.path.join(self.infofiles_path, "instrumentation", "responses",
+                           "_filters", "PolesZeros",
+                           "HiTech_HTI-90U_SIO-preamp_generic.filter.yaml")
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        fname = os.path.join(tmpdir, os.path.basename(src))
+        shutil.copy(src, fname)
+        cache = get_file_cache()
+        cache.invalidate()
+        hits, misses = cache.hits, cache.misses
+        first, _ = load_information_file(fname)
+        first["filter"]["type"] = "MODIFIED"
+        second, _ = load_information_file(fname + "#filter")
+        self.assertEqual(cache.misses - misses, 1)
+        self.assertEqual(cache.hits - hits, 1)
+        self.assertNotEqual(second["type"], "MODIFIED")
+        with open(fname, "a") as f:
+            f.write("\n")
+        load_information_file(fname)
+        self.assertEqual(cache.misses - misses, 2)
+        cache.invalidate(fname)
+        self.assertEqual(len(cache), 0)
+
+    def test_file_cache_lru(self):
+        """
+        Test least-recently-used eviction of the information file cache
+        """
+        cache = information_file_cache(maxsize=2)
+        fnames = glob.glob(os.path.join(self.infofiles_path, "instrumentation",
+                                        "responses", "Sensors",
+                                        "*.response.yaml"))[:3]
+        for fname in fnames:
+            cache.put(fname, {})
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get(fnames[0]))
+        self.assertIsNotNone(cache.get(fnames[2]))
+
+    def test_component_indexes(self):
+        """
+        Test indexed lookup of generic, configured and specific components
+        """
+        components = instrument_components(os.path.join(
+            self.infofiles_path, "instrumentation",
+            "instrument_components.yaml"))
+        self.assertEqual(components.get_component("datalogger", "LC2000"),
+                         components.get_component("datalogger",
+                                                  "LC2000_LOGGER"))
+        self.assertIn("LC2000_LOGGER_62.5sps",
+                      components.get_component("datalogger", "LC2000_LOGGER"))
+        self.assertIsNone(components.get_component("datalogger", "LOGGER"))
+        self.assertIsNotNone(components.get_generic("datalogger",
+                                                    "LC2000_LOGGER", "125sps"))
+        sensor = components.get_component(
+            "sensor", "NANOMETRICS_T240_SINGLESIDED", "Sphere07")
+        self.assertEqual(sensor.equipment.serial_number, "136")
+
+    def test_specific_components(self):
+        """
+        Test that specific components get their own responses
+        """
+        components = instrument_components(os.path.join(
+            self.infofiles_path, "instrumentation",
+            "instrument_components.yaml"))
+        code = "NANOMETRICS_T240_SINGLESIDED"
+        template = components.get_template("sensor", code)
+        generic = components.get_component("sensor", code, "Sphere99")
+        early = components.get_component("sensor", code, "132")
+        late = components.get_component("sensor", code, "Sphere06")
+        self.assertIsNotNone(components.get_specific("sensor", code, "826"))
+        self.assertIsNone(components.get_specific("sensor", code, "Sphere99"))
+        self.assertEqual(generic.equipment.serial_number, "Sphere99")
+        self.assertEqual(late.equipment.serial_number, "830")
+        self.assertIn("SN400", late.response_superstages[0]["$ref"])
+        self.assertEqual(early.response_key(), generic.response_key())
+        self.assertNotEqual(late.response_key(), generic.response_key())
+        self.assertIs(template.response_superstages,
+                      generic.response_superstages)
+        late.fill_responses()
+        generic.fill_responses()
+        self.assertIsNot(late.response, generic.response)
+        self.assertIsNone(template.response)
+
+    def test_component_templates(self):
+        """
+        Test that components share their template, but not their equipment
+        """
+        components = instrument_components(os.path.join(
+            self.infofiles_path, "instrumentation",
+            "instrument_components.yaml"))
+        code = "NANOMETRICS_T240_SINGLESIDED"
+        a = components.get_component("sensor", code, "Sphere98")
+        b = components.get_component("sensor", code, "Sphere99")
+        template = components.get_template("sensor", code)
+        self.assertIs(a.response_superstages, b.response_superstages)
+        self.assertEqual(a.equipment.serial_number, "Sphere98")
+        self.assertEqual(b.equipment.serial_number, "Sphere99")
+        self.assertIsNone(template.equipment.serial_number)
+
+    def test_response_chains(self):
+        """
+        Test that channels with the same components share their responses
+        """
+        net = network(os.path.join(self.infofiles_path, "campaign",
+                                   "BBOBS.INSU-IPGP.network.yaml"))
+        chains = net.response_chains()
+        self.assertEqual(sum(chains.values()), 8)
+        self.assertEqual(len(chains), 5)
+        loggers = [channel["datalogger"]
+                   for station in net.stations.values()
+                   for inst in station.instruments
+                   for channel in inst.das_components.values()]
+        self.assertIs(loggers[0].response, loggers[-1].response)
+
+    def test_response_cache(self):
+        """
+        Test that channels with identical stages share one obspy Response
+        """
+        net = network(os.path.join(self.infofiles_path, "campaign",
+                                   "BBOBS.INSU-IPGP.network.yaml"))
+        cache = dict()
+        station = net.stations["BB_1"].make_obspy_station(responses=cache)
+        responses = [channel.response for channel in station.channels]
+        self.assertEqual(len(responses), 4)
+        self.assertEqual(len(set(id(r) for r in responses)), 3)
+        self.assertEqual(len(cache), 3)
+        # Responses are not shared between sensitivity engines
+        oi_obspy.set_sensitivity_engine("obspy")
+        try:
+            station = net.stations["BB_1"].make_obspy_station(responses=cache)
+        finally:
+            oi_obspy.set_sensitivity_engine("numpy")
+        self.assertEqual(len(cache), 6)
+        self.assertFalse(set(id(c.response) for c in station.channels)
+                         & set(id(r) for r in responses))
+
+    def test_sensitivity_engines(self):
+        """
+        Test that the NumPy overall sensitivities match obspy's (evalresp)
+        """
+        for fname in ["SPOBS.INSU-IPGP.network.yaml",
+                      "BBOBS.INSU-IPGP.network.yaml"]:
+            net = network(os.path.join(self.infofiles_path, "campaign",
+                                       fname))
+            for station in net.stations.values():
+                oi_obspy.set_sensitivity_engine("obspy")
+                try:
+                    channels = station.make_obspy_station().channels
+                finally:
+                    oi_obspy.set_sensitivity_engine("numpy")
+                responses = [c.response for c in channels]
+                frequencies = [r.instrument_sensitivity.frequency
+                               for r in responses]
+                values = overall_sensitivities(responses, frequencies)
+                for response, value in zip(responses, values):
+                    self.assertAlmostEqual(
+                        value / response.instrument_sensitivity.value, 1.,
+                        places=12)
+
+    def test_stacked_sensitivities(self):
+        """
+        Test that the stages of many Responses, evaluated together at another
+        frequency, give the sensitivities evalresp calculates
+        """
+        net = network(os.path.join(self.infofiles_path, "campaign",
+                                   "BBOBS.INSU-IPGP.network.yaml"))
+        responses = [c.response for station in net.stations.values()
+                     for c in station.make_obspy_station().channels]
+        values = overall_sensitivities(responses, 0.5)
+        for response, value in zip(responses, values):
+            response = copy.deepcopy(response)
+            response.recalculate_overall_sensitivity(0.5)
+            self.assertAlmostEqual(
+                value / response.instrument_sensitivity.value, 1., places=12)
+
+    def test_norm_factors(self):
+        """
+        Test memoized normalization factor calculation
+        """
+        pz = ([0j, 0j], [-0.037 + 0.037j, -0.037 - 0.037j],
+              1., "LAPLACE (RADIANS/SECOND)")
+        self.assertAlmostEqual(calc_norm_factor([], [-1.], 1., "LAPLACE (HERTZ)"),
+                               abs(1j + 1.))
+        first = calc_norm_factor(*pz)
+        hits = oi_misc._norm_factor.cache_info().hits
+        self.assertEqual(calc_norm_factor(*pz), first)
+        self.assertEqual(oi_misc._norm_factor.cache_info().hits, hits + 1)
+        self.assertRaises(ValueError, calc_norm_factor, [], [0.5], 1.,
+                          "DIGITAL (Z-TRANSFORM)")
+
+    def test_obspy_stages(self):
+        """
+        Test that built responses only hold obspy's own stage classes, and
+        can be written by obspy as they are
+        """
+        net = network(os.path.join(self.infofiles_path, "campaign",
+                                   "BBOBS.INSU-IPGP.network.yaml"))
+        station = net.stations["BB_1"].make_obspy_station()
+        stages = [stage for channel in station.channels
+                  for stage in channel.response.response_stages]
+        self.assertTrue(all(type(stage).__module__ == FIRResponseStage.__module__
+                            for stage in stages))
+        firs = [stage for stage in stages if type(stage) is FIRResponseStage]
+        same = [(a, b) for a in firs for b in firs
+                if a is not b and a.coefficients == b.coefficients]
+        self.assertTrue(same)
+        # Stages from the same filter share their obspy coefficients
+        for a, b in same:
+            self.assertIs(a.coefficients[0], b.coefficients[0])
+        inv = Inventory([Network("XX", [station])], "obsinfo")
+        buffer = io.BytesIO()
+        inv.write(buffer, "STATIONXML")
+        buffer.seek(0)
+        channels = read_inventory(buffer, "STATIONXML")[0][0].channels
+        self.assertEqual([c.response.response_stages[-1].coefficients
+                          for c in channels],
+                         [c.response.response_stages[-1].coefficients
+                          for c in station.channels])
+
+    def test_response_builder(self):
+        """
+        Test that responses built concurrently match those built serially
+        """
+        net = network(os.path.join(self.infofiles_path, "campaign",
+                                   "BBOBS.INSU-IPGP.network.yaml"))
+        chains = [channel["response"]
+                  for station in net.stations.values()
+                  for inst in station.instruments
+                  for channel in inst.das_components.values()]
+        builders = [oi_obspy.ResponseBuilder(chain) for chain in chains]
+        serial = [builder.build() for builder in builders]
+        with ThreadPoolExecutor(4) as executor:
+            parallel = list(executor.map(lambda b: b.build(), builders[::-1]))
+        self.assertEqual(serial, parallel[::-1])
+        self.assertEqual(builders[0].input_sample_rates[-1], 125.)
+
+    def test_parallel_stationXML(self):
+        """
+        Test writing StationXML files in parallel, with a failing station
+        """
+        net = network(os.path.join(self.infofiles_path, "campaign",
+                                   "BBOBS.INSU-IPGP.network.yaml"))
+        net.stations["BB_1"].instruments = None
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        errors = net.write_station_XMLs(tmpdir, n_jobs=2)
+        self.assertEqual(list(errors), ["BB_1"])
+        self.assertEqual(os.listdir(tmpdir), ["4G.BB_2.STATION.xml"])
+
+    def test_network_stationXML(self):
+        """
+        Test writing several stations to one network StationXML file
+        """
+        net = network(os.path.join(self.infofiles_path, "campaign",
+                                   "BBOBS.INSU-IPGP.network.yaml"))
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        fname = net.write_network_stationXML(destination_folder=tmpdir)
+        self.assertEqual(os.path.basename(fname), "4G.STATION.xml")
+        inv = read_inventory(fname)
+        self.assertEqual([sta.code for sta in inv[0]], ["BB_1", "BB_2"])
+        fname = net.write_network_stationXML(["BB_2"], tmpdir, "BB_2.xml")
+        self.assertEqual(len(read_inventory(fname)[0]), 1)
+
+    def test_streamed_stationXML(self):
+        """
+        Test that a streamed network StationXML file is the same as one
+        written from a complete inventory
+        """
+        net = network(os.path.join(self.infofiles_path, "campaign",
+                                   "BBOBS.INSU-IPGP.network.yaml"))
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        for serializer in ["obspy", "lxml"]:
+            texts = []
+            for streaming in [False, True]:
+                fname = net.write_network_stationXML(
+                    destination_folder=tmpdir, streaming=streaming,
+                    serializer=serializer)
+                with open(fname) as f:
+                    texts.append([line for line in f
+                                  if "<Created>" not in line])
+                if streaming:  # Stations' responses are not kept
+                    self.assertEqual(net.responses, {})
+                else:
+                    self.assertTrue(net.responses)
+                    net.responses.clear()
+            self.assertEqual(texts[0], texts[1])
+
+    def test_failed_stream(self):
+        """
+        Test that a failing streamed StationXML file leaves the previous
+        file in place
+        """
+        net = network(os.path.join(self.infofiles_path, "campaign",
+                                   "BBOBS.INSU-IPGP.network.yaml"))
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        fname = net.write_network_stationXML(destination_folder=tmpdir,
+                                             streaming=True)
+        with open(fname, "rb") as f:
+            text = f.read()
+        net.stations["BB_2"].instruments = None
+        self.assertRaises(TypeError, net.write_network_stationXML,
+                          destination_folder=tmpdir, streaming=True)
+        with open(fname, "rb") as f:
+            self.assertEqual(f.read(), text)
+        self.assertEqual(os.listdir(tmpdir), [os.path.basename(fname)])
+
+    def test_lxml_serializer(self):
+        """
+        Test that the lxml StationXML serializer writes the same StationXML
+        as obspy's writer
+        """
+        compare = XmlTree()
+        excludes = [compare.add_ns(x) for x in ["Created"]]
+        for fname in ["SPOBS.INSU-IPGP.network.yaml",
+                      "BBOBS.INSU-IPGP.network.yaml"]:
+            net = network(os.path.join(self.infofiles_path, "campaign", fname))
+            dirs = [tempfile.mkdtemp(), tempfile.mkdtemp()]
+            for dir in dirs:
+                self.addCleanup(shutil.rmtree, dir)
+            for station_name in net.stations:
+                xml1, xml2 = [
+                    ET.parse(net.write_stationXML(station_name, dir,
+                                                  serializer=serializer))
+                    for dir, serializer in zip(dirs, ["obspy", "lxml"])
+                ]
+                self.assertTrue(compare.xml_compare(
+                    compare.getroot(xml1), compare.getroot(xml2),
+                    excludes=excludes))
+
+    def test_lxml_serializer_support(self):
+        """
+        Test that the lxml serializer fails clearly without obspy's helpers
+        """
+        self.assertTrue(oi_stationxml.supported())
+        fname = os.path.join(self.infofiles_path, "campaign",
+                             "BBOBS.INSU-IPGP.network.yaml")
+        with mock.patch.object(oi_stationxml, "_OBSPY_HELPERS",
+                               ("_no_such_helper",)):
+            self.assertFalse(oi_stationxml.supported())
+            self.assertRaises(RuntimeError, oi_stationxml.write_stationxml,
+                              Inventory([], "obsinfo"), io.BytesIO())
+            with contextlib.redirect_stderr(io.StringIO()):
+                self.assertRaises(SystemExit, _make_stationXML_script,
+                                  [fname, "--serializer", "lxml"])
+
+    def test_stationXML_script_options(self):
+        """
+        Test that options which would be ignored are rejected
+        """
+        fname = os.path.join(self.infofiles_path, "campaign",
+                             "BBOBS.INSU-IPGP.network.yaml")
+        for options, message in [
+                (["--streaming"], "--streaming requires --network_output"),
+                (["--network_output", "-j", "2"], "-j/--jobs cannot be used")]:
+            stderr = io.StringIO()
+            with contextlib.redirect_stderr(stderr):
+                self.assertRaises(SystemExit, _make_stationXML_script,
+                                  [fname] + options)
+            self.assertIn(message, stderr.getvalue())
+
+    def test_incremental_stationXML(self):
+        """
+        Test that incremental builds only rewrite stale StationXML files
+        """
+        net = network(os.path.join(self.infofiles_path, "campaign",
+                                   "BBOBS.INSU-IPGP.network.yaml"))
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        self.assertEqual(net.write_station_XMLs(tmpdir, incremental=True), {})
+        inputs = net.build_inputs("BB_1")
+        self.assertIn(os.path.join(self.infofiles_path, "instrumentation",
+                                   "instrumentation.yaml"), inputs["files"])
+        fname = net.stationXML_filename("BB_1")
+        self.assertTrue(build_manifest(tmpdir).is_current(
+            fname, {"BB_1": inputs}))
+        # A changed station element only makes its own station stale
+        net.station_hashes["BB_2"] = "changed"
+        manifest = build_manifest(tmpdir)
+        self.assertTrue(manifest.is_current(fname, {"BB_1": inputs}))
+        self.assertFalse(manifest.is_current(
+            net.stationXML_filename("BB_2"),
+            {"BB_2": net.build_inputs("BB_2")}))
+        # A missing file is rewritten
+        os.remove(os.path.join(tmpdir, fname))
+        net.write_station_XMLs(tmpdir, incremental=True)
+        self.assertTrue(os.path.isfile(os.path.join(tmpdir, fname)))
+        manifest = build_manifest(tmpdir)
+        for name in net.stations:
+            self.assertTrue(manifest.is_current(
+                net.stationXML_filename(name),
+                {name: net.build_inputs(name)}))
+
 
 def suite():
     return unittest.makeSuite(TestADDONSMethods, 'test')
@@ -1 +1 @@
-__version__ = "0.106.1"
+__version__ = "0.107"
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Compare YAML parse times of the pure-Python and libyaml (C) loaders
+
+Reads every *.yaml information file under a directory (default: the
+obsinfo example information files) with each loader, checks that both give
+identical results and prints the total parse time per loader.
+
+usage: benchmark_yaml_loaders.py [DIRECTORY] [-n REPEATS]
+"""
+import argparse
+import glob
+import os.path
+import time
+
+import pkg_resources
+import yaml
+
+from obsinfo.misc.info_files import read_json_yaml
+
+
+def time_loader(files, loader, repeats):
+    """ Returns the best total parse time (s) over repeats, and the results """
+    best = None
+    for i in range(repeats):
+        start = time.perf_counter()
+        results = [read_json_yaml(f, loader=loader) for f in files]
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "directory",
+        nargs="?",
+        default=pkg_resources.resource_filename(
+            "obsinfo", "_examples/Information_Files"
+        ),
+    )
+    parser.add_argument("-n", "--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    files = sorted(
+        glob.glob(os.path.join(args.directory, "**", "*.yaml"), recursive=True)
+    )
+    print(f"{len(files):d} YAML files in {args.directory}")
+
+    py_time, py_results = time_loader(files, yaml.SafeLoader, args.repeats)
+    print(f"  yaml.SafeLoader  : {py_time:.3f} s")
+    if not yaml.__with_libyaml__:
+        print("  yaml.CSafeLoader : not available (PyYAML built without libyaml)")
+        return
+    c_time, c_results = time_loader(files, yaml.CSafeLoader, args.repeats)
+    print(f"  yaml.CSafeLoader : {c_time:.3f} s ({py_time / c_time:.1f}x faster)")
+    if c_results != py_results:
+        print("  WARNING: the two loaders gave different results!")
+    else:
+        print("  Both loaders gave identical results")
+
+
+if __name__ == "__main__":
+    main()